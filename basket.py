@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Quantity of every item bought in one month by the q5-q7 basket
+MONTHLY_QUANTITY = 8
+
+
+class BasketCube:
+    """
+    Item prices as a 3-D array of dates x provinces x items.
+
+    The array is built once from a price frame, after which the cost of any
+    basket (a quantity per item) is a single weighted reduction over the item
+    axis, and many baskets can be priced together with one matrix product.
+    Missing prices count as zero, like a groupby sum, and only (date, province)
+    cells that had at least one price row are reported.
+    """
+
+    def __init__(self, prices, observed, dates, provinces, items, by_province=True):
+        self.prices = prices
+        self.observed = observed
+        self.dates = pd.DatetimeIndex(dates, name='date')
+        self.provinces = pd.Index(provinces, name='province')
+        self.items = pd.Index(items, name='item')
+        self.by_province = by_province
+
+    @classmethod
+    def from_frame(cls, df, date_column='date', province_column='province', item_column='item', price_column='price'):
+        """Build the cube from a long price frame; without a province column the cube is national."""
+        by_province = province_column in df.columns
+        date_codes, dates = pd.factorize(df[date_column], sort=True)
+        if by_province:
+            province_codes, provinces = pd.factorize(df[province_column], sort=True)
+        else:
+            province_codes, provinces = np.zeros(len(df), dtype=int), pd.Index(['Canada'])
+        item_codes, items = pd.factorize(df[item_column], sort=True)
+
+        prices = np.zeros((len(dates), len(provinces), len(items)))
+        np.add.at(prices, (date_codes, province_codes, item_codes), np.nan_to_num(df[price_column].to_numpy(dtype=np.float64)))
+        observed = np.zeros((len(dates), len(provinces)), dtype=bool)
+        observed[date_codes, province_codes] = True
+        # Plain labels, so categorical inputs do not leak unused categories into the results
+        return cls(prices, observed, dates, np.asarray(provinces), np.asarray(items), by_province)
+
+    def weights(self, quantities):
+        """Quantity vector over the cube's items from a scalar (every item) or an {item: quantity} dict."""
+        if np.isscalar(quantities):
+            return np.full(len(self.items), float(quantities))
+        return pd.Series(quantities, dtype=np.float64).reindex(self.items, fill_value=0.0).to_numpy()
+
+    def costs(self, baskets):
+        """
+        Cost of several baskets at once.
+
+        Parameters:
+        - baskets: {name: quantities}, where quantities is anything weights() accepts.
+
+        Returns:
+        - pd.DataFrame: date (and province) columns plus one cost column per basket.
+        """
+        weight_matrix = np.column_stack([self.weights(quantities) for quantities in baskets.values()])
+        totals = self.prices @ weight_matrix
+
+        date_index, province_index = np.nonzero(self.observed)
+        result = pd.DataFrame({'date': self.dates[date_index]})
+        if self.by_province:
+            result['province'] = self.provinces[province_index]
+        for i, name in enumerate(baskets):
+            result[name] = totals[date_index, province_index, i]
+        return result
+
+    def cost(self, quantities=MONTHLY_QUANTITY, name='sum'):
+        """Cost of a single basket per date (and province)."""
+        return self.costs({name: quantities})
@@ -0,0 +1,398 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import preprocessing_country_data as country
+import preprocessing_data
+import preprocessing_province_data as province
+import tracing
+from pipeline import STAGES
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Generated raw files and the stage trees built on them; kept between runs since generation is deterministic
+DATA_DIR = os.path.join(ROOT_DIR, '.cache', 'benchmark')
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmark_baseline.json')
+SCALES = [1, 10, 100, 1000]
+# Relative change in time or peak memory reported as a regression or an improvement
+TOLERANCE = 0.25
+STAGE_TIMEOUT = 3600
+SEED = 0
+
+PRICE_COLUMNS = ['REF_DATE', 'GEO', 'DGUID', 'Products', 'UOM', 'UOM_ID', 'SCALAR_FACTOR', 'SCALAR_ID', 'VECTOR', 'COORDINATE', 'VALUE', 'STATUS', 'SYMBOL', 'TERMINATED', 'DECIMALS']
+PROVINCES = ['Alberta', 'British Columbia', 'Manitoba', 'New Brunswick', 'Newfoundland and Labrador', 'Nova Scotia', 'Ontario', 'Prince Edward Island', 'Quebec', 'Saskatchewan']
+TERRITORIES = ['Northwest Territories', 'Nunavut', 'Yukon Territories']
+CPI_PRODUCTS = ['All-items', 'Food 5', 'Shelter 6', 'Household operations, furnishings and equipment', 'Clothing and footwear', 'Transportation', 'Gasoline', 'Health and personal care', 'Recreation, education and reading', 'Alcoholic beverages, tobacco products and recreational cannabis', 'All-items excluding food and energy 7', 'All-items excluding energy 7', 'Energy 7', 'Goods 8', 'Services 9']
+
+# Shape of the current raw files at 1x: geographies, number of products, first and last month
+PRICE_22_SHAPE = (['Canada'], 63, '1995-01', '2022-02')
+PRICE_24_SHAPE = (['Canada'] + PROVINCES, 110, '2017-01', '2024-09')
+CPI_MONTHS = ('2000-01', '2024-09')
+WAGE_YEARS = (2000, 2024)
+# Runs a stage script as __main__ and writes its peak resident memory in bytes to argv[2].
+# VmHWM belongs to the stage's own address space; ru_maxrss would also count the
+# benchmark process, whose memory the child inherits for a moment when it is forked.
+STAGE_RUNNER = """
+import os, resource, runpy, sys
+path, peak_path = sys.argv[1:3]
+sys.argv = [path]
+sys.path[0] = os.path.dirname(path)
+runpy.run_path(path, run_name='__main__')
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+if os.path.exists('/proc/self/status'):
+    with open('/proc/self/status') as f:
+        peak = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmHWM:'))
+with open(peak_path, 'w') as f:
+    f.write(str(peak))
+"""
+# Rows written per to_csv call while generating
+CHUNK_ROWS = 200_000
+
+
+def scale_factors(scale):
+    """Split a scale into (geography, product, month) multipliers whose product is about the scale."""
+    side = max(1, round(scale ** (1 / 3)))
+    return max(1, math.ceil(scale / side ** 2)), side, side
+
+
+def regions(count):
+    """Names of the synthetic geographies added beyond the real ones."""
+    return [f"Region {i + 1}" for i in range(count)]
+
+
+def scaled_products(names, count):
+    """The real product names first, then synthetic ones up to count."""
+    return list(names) + [f"Product {i + 1}, 1 kilogram" for i in range(count - len(names))]
+
+
+def scaled_months(start, end, factor):
+    """The month range extended back in time so it is factor times as long."""
+    months = pd.period_range(start, end, freq='M')
+    return pd.period_range(months[0] - len(months) * (factor - 1), months[-1], freq='M')
+
+
+def write_price_table(path, geos, products, months, rng):
+    """Write a StatCan-shaped price table with a random walk of prices for every geography and product."""
+    levels = rng.uniform(1.5, 6.0, size=(len(geos), len(products)))
+    geo_column = np.repeat(np.asarray(geos, dtype=object), len(products))
+    product_column = np.tile(np.asarray(products, dtype=object), len(geos))
+    vectors = np.array([f"v{i}" for i in range(len(geo_column))], dtype=object)
+    months_per_chunk = max(1, CHUNK_ROWS // len(geo_column))
+
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        for first in range(0, len(months), months_per_chunk):
+            chunk_months = months[first:first + months_per_chunk]
+            values = []
+            for _ in chunk_months:
+                levels *= np.exp(rng.normal(0.0, 0.01, size=levels.shape))
+                values.append(levels.ravel().round(2))
+            rows = len(chunk_months) * len(geo_column)
+            chunk = pd.DataFrame({
+                'REF_DATE': np.repeat(chunk_months.strftime('%Y-%m').to_numpy(), len(geo_column)),
+                'GEO': np.tile(geo_column, len(chunk_months)),
+                'DGUID': '2016A000011124',
+                'Products': np.tile(product_column, len(chunk_months)),
+                'UOM': 'Dollars',
+                'UOM_ID': 81,
+                'SCALAR_FACTOR': 'units',
+                'SCALAR_ID': 0,
+                'VECTOR': np.tile(vectors, len(chunk_months)),
+                'COORDINATE': 1.1,
+                'VALUE': np.concatenate(values),
+                'STATUS': np.full(rows, np.nan),
+                'SYMBOL': np.full(rows, np.nan),
+                'TERMINATED': np.full(rows, np.nan),
+                'DECIMALS': 2,
+            }, columns=PRICE_COLUMNS)
+            chunk.to_csv(f, header=first == 0, index=False)
+    return len(months) * len(geo_column)
+
+
+def write_cpi_table(path, products, months, rng):
+    """Write the wide CPI table: one row per product and one column per month."""
+    steps = rng.normal(0.002, 0.004, size=(len(products), len(months)))
+    values = (90.0 * np.exp(np.cumsum(steps, axis=1))).round(1)
+    df = pd.DataFrame(values.astype(str), columns=months.strftime('%B %Y'))
+    df.insert(0, 'Products', products)
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    return len(products) * len(months)
+
+
+def write_wage_table(path, geos, rng):
+    """Write minimum wage announcements (one or two a year) for every geography."""
+    rows = []
+    for geo in geos:
+        wage = rng.uniform(5.0, 8.0)
+        for year in range(WAGE_YEARS[0], WAGE_YEARS[1] + 1):
+            for _ in range(rng.integers(1, 3)):
+                wage += rng.uniform(0.0, 0.4)
+                date = pd.Timestamp(year=year, month=int(rng.integers(1, 13)), day=1)
+                rows.append([geo, date.strftime('%d-%b-%y'), f"${wage:.2f}", ''])
+    pd.DataFrame(rows, columns=['province', 'Effective Date', 'Minimum Wage', 'Note']).to_csv(path, index=False, encoding='utf-8-sig')
+    return len(rows)
+
+
+def write_inflation_table(path, years, rng):
+    """Write one year-end inflation row per year."""
+    df = pd.DataFrame({
+        'date': [f"{year}-12-31" for year in years],
+        'GDP': rng.uniform(1.0, 7.0, size=len(years)).round(4),
+        'annual_percent_change': rng.normal(0.0, 2.0, size=len(years)).round(2),
+    })
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def generate(raw_dir, scale, seed=SEED):
+    """
+    Write StatCan-shaped price, CPI, wage and inflation files at a multiple of the current size.
+
+    The scale is spread over more geographies (synthetic regions next to the real
+    provinces), more products (synthetic products next to the analysed items) and
+    more months (history extended back in time).
+
+    Returns:
+    - dict: rows written per file.
+    """
+    geo_factor, product_factor, month_factor = scale_factors(scale)
+    rng = np.random.default_rng(seed)
+    os.makedirs(raw_dir, exist_ok=True)
+
+    geos_22, products_22, start_22, end_22 = PRICE_22_SHAPE
+    geos_24, products_24, start_24, end_24 = PRICE_24_SHAPE
+    extra_geos = regions(len(geos_24) * (geo_factor - 1))
+    cpi_months = scaled_months(*CPI_MONTHS, month_factor)
+
+    rows = {}
+    rows['price-to-17.csv'] = write_price_table(
+        os.path.join(raw_dir, 'price-to-17.csv'), geos_22 + extra_geos[:len(geos_22) * (geo_factor - 1)],
+        scaled_products(country.items_22, products_22 * product_factor), scaled_months(start_22, end_22, month_factor), rng)
+    rows['price-to-24.csv'] = write_price_table(
+        os.path.join(raw_dir, 'price-to-24.csv'), geos_24 + extra_geos,
+        scaled_products(country.items_24, products_24 * product_factor), scaled_months(start_24, end_24, month_factor), rng)
+    rows['cpi.csv'] = write_cpi_table(
+        os.path.join(raw_dir, 'cpi.csv'), scaled_products(CPI_PRODUCTS, len(CPI_PRODUCTS) * product_factor), cpi_months, rng)
+    rows['wages.csv'] = write_wage_table(os.path.join(raw_dir, 'wages.csv'), PROVINCES + TERRITORIES + extra_geos, rng)
+    rows['inflation.csv'] = write_inflation_table(
+        os.path.join(raw_dir, 'inflation.csv'), range(cpi_months[0].year, cpi_months[-1].year), rng)
+    return rows
+
+
+def ensure_data(scale):
+    """Generate the raw files for a scale unless an earlier run already did."""
+    raw_dir = os.path.join(DATA_DIR, f"scale-{scale}", 'raw_data')
+    marker = os.path.join(raw_dir, 'generated.json')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            return raw_dir, json.load(f)
+    start = time.perf_counter()
+    rows = generate(raw_dir, scale)
+    print(f"Generated {scale}x data ({sum(rows.values()):,} rows) in {time.perf_counter() - start:.1f}s")
+    with open(marker, 'w') as f:
+        json.dump(rows, f, indent=2)
+    return raw_dir, rows
+
+
+def preprocessing_steps(module):
+    """The steps of a preprocessing module's run(), as (function, argument names, result names)."""
+    return [
+        (module.stream_data, ['price_path_22', 'price_path_24', 'wage_path', 'items_22', 'items_24'], ['df_22', 'df_24', 'wage_df']),
+        (module.filter_and_format_dates, ['df_22', 'df_24'], ['df_22', 'df_24']),
+        (module.filter_items, ['df_22', 'df_24', 'items_22', 'items_24'], ['df_22', 'df_24']),
+        (module.clean_combined_data, ['df_22', 'df_24', 'items_22', 'items_24'], ['combined_df']),
+        (module.process_wage_data, ['wage_df'], ['wage_df']),
+        (module.merge_wages_with_prices, ['combined_df', 'wage_df'], ['combined_df']),
+        (module.load_and_reformat_cpi, ['cpi_path'], ['cpi_df']),
+        (module.create_cpi_wage_dataset, ['cpi_df', 'wage_df'], ['cpi_wage_df']),
+        (module.load_inflation_data, ['inflation_path'], ['inflation_df']),
+        (module.add_inflation_change, ['cpi_wage_df', 'inflation_df'], ['cpi_wage_df']),
+    ]
+
+
+def fused_steps():
+    """The steps of the fused preprocessing engine."""
+    return [
+        (preprocessing_data.load_sources, ['price_path_22', 'price_path_24', 'wage_path', 'cpi_path', 'inflation_path'], ['df_22', 'df_24', 'wage_df', 'cpi_df', 'inflation_df']),
+        (preprocessing_data.build_datasets, ['df_22', 'df_24', 'wage_df', 'cpi_df', 'inflation_df'], ['outputs']),
+    ]
+
+
+def call_step(function, state, arg_names):
+    """Call a step on fresh copies of its inputs, since several steps modify frames in place."""
+    args = [state[name].copy() if isinstance(state[name], pd.DataFrame) else state[name] for name in arg_names]
+    return function(*args)
+
+
+def run_steps(steps, raw_dir):
+    """
+    Time every step, then run it again under tracemalloc for its peak memory.
+
+    Returns:
+    - dict: {module.function: {'status', 'seconds', 'peak_mb', 'rows'}}.
+    """
+    state = {
+        'price_path_22': os.path.join(raw_dir, 'price-to-17.csv'),
+        'price_path_24': os.path.join(raw_dir, 'price-to-24.csv'),
+        'wage_path': os.path.join(raw_dir, 'wages.csv'),
+        'cpi_path': os.path.join(raw_dir, 'cpi.csv'),
+        'inflation_path': os.path.join(raw_dir, 'inflation.csv'),
+        'items_22': country.items_22,
+        'items_24': country.items_24,
+    }
+    results = {}
+    for function, arg_names, result_names in steps:
+        name = f"{function.__module__}.{function.__name__}"
+        try:
+            start = time.perf_counter()
+            result = call_step(function, state, arg_names)
+            seconds = time.perf_counter() - start
+
+            tracemalloc.start()
+            call_step(function, state, arg_names)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        except MemoryError:
+            tracemalloc.stop()
+            results[name] = {'status': 'out of memory'}
+            break
+
+        values = result if len(result_names) > 1 else (result,)
+        state.update(zip(result_names, values))
+        results[name] = {'status': 'ok', 'seconds': seconds, 'peak_mb': peak / 2 ** 20, 'rows': tracing.count_rows(result)}
+    return results
+
+
+def build_tree(scale, raw_dir):
+    """Copy the scripts into a fresh tree whose raw_data is the generated data, so stages run untouched."""
+    tree_dir = os.path.join(DATA_DIR, f"scale-{scale}", 'tree')
+    if os.path.exists(tree_dir):
+        shutil.rmtree(tree_dir)
+    os.makedirs(os.path.join(tree_dir, 'plots'))
+    for file in os.listdir(ROOT_DIR):
+        if file.endswith('.py'):
+            shutil.copy(os.path.join(ROOT_DIR, file), tree_dir)
+    for stage in STAGES:
+        os.makedirs(os.path.dirname(os.path.join(tree_dir, stage['path'])), exist_ok=True)
+        shutil.copy(os.path.join(ROOT_DIR, stage['path']), os.path.join(tree_dir, stage['path']))
+    os.symlink(raw_dir, os.path.join(tree_dir, 'raw_data'))
+    return tree_dir
+
+
+def run_stage(stage, tree_dir, timeout=STAGE_TIMEOUT):
+    """Run one stage script in its own process and return its wall time and peak resident memory."""
+    file_path = os.path.join(tree_dir, stage['path'])
+    env = dict(os.environ, MPLBACKEND='Agg')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        peak_path = os.path.join(tmp_dir, 'peak')
+        start = time.perf_counter()
+        try:
+            result = subprocess.run([sys.executable, '-c', STAGE_RUNNER, file_path, peak_path], cwd=os.path.dirname(file_path), env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {'status': 'timeout'}
+        seconds = time.perf_counter() - start
+        if result.returncode:
+            print(f"Error with {stage['name']}: {result.stderr.strip()}")
+            return {'status': f"exit {result.returncode}"}
+        with open(peak_path) as f:
+            peak = int(f.read())
+    return {'status': 'ok', 'seconds': seconds, 'peak_mb': peak / 2 ** 20}
+
+
+def run_scale(scale, timeout=STAGE_TIMEOUT):
+    """Benchmark every preprocessing function and every pipeline stage on generated data of one scale."""
+    raw_dir, raw_rows = ensure_data(scale)
+    results = {}
+    for steps in (preprocessing_steps(country), preprocessing_steps(province), fused_steps()):
+        results.update(run_steps(steps, raw_dir))
+
+    tree_dir = build_tree(scale, raw_dir)
+    for stage in STAGES:
+        print(f"Running {stage['name']} at {scale}x")
+        results[f"stage.{stage['name']}"] = run_stage(stage, tree_dir, timeout)
+    return {'raw_rows': raw_rows, 'results': results}
+
+
+def change(value, baseline):
+    """Describe a measurement relative to the baseline."""
+    if not baseline:
+        return ''
+    ratio = value / baseline
+    if ratio > 1 + TOLERANCE:
+        return f"{ratio:.2f}x slower"
+    if ratio < 1 - TOLERANCE:
+        return f"{ratio:.2f}x faster"
+    return f"{ratio:.2f}x"
+
+
+def print_results(runs, baseline=None):
+    """Print every measurement, next to the baseline's when there is one."""
+    for scale, run in runs.items():
+        base = (baseline or {}).get(scale, {}).get('results', {})
+        print(f"\n{scale}x ({sum(run['raw_rows'].values()):,} raw rows)")
+        print(f"{'benchmark':<55}{'status':<15}{'time (s)':>10}{'peak (MB)':>11}{'rows':>12}  {'time vs baseline':<18}{'memory vs baseline'}")
+        for name, result in run['results'].items():
+            if result['status'] != 'ok':
+                print(f"{name:<55}{result['status']:<15}")
+                continue
+            previous = base.get(name, {})
+            print(f"{name:<55}{result['status']:<15}{result['seconds']:>10.3f}{result['peak_mb']:>11.1f}{result.get('rows', ''):>12}  "
+                  f"{change(result['seconds'], previous.get('seconds')):<18}{change(result['peak_mb'], previous.get('peak_mb'))}")
+
+
+def print_scaling(runs):
+    """Fit how time and memory grow with the scale, and report the first scale each benchmark fails at."""
+    scales = sorted(runs, key=int)
+    if len(scales) < 2:
+        return
+    print(f"\nScaling from {scales[0]}x to {scales[-1]}x (time ~ scale^a, memory ~ scale^b)")
+    for name in runs[scales[0]]['results']:
+        measured = [(int(scale), runs[scale]['results'].get(name, {'status': 'not run'})) for scale in scales]
+        ok = [(scale, result) for scale, result in measured if result['status'] == 'ok']
+        failed = [(scale, result['status']) for scale, result in measured if result['status'] != 'ok']
+        line = f"{name:<55}"
+        if len(ok) >= 2:
+            (first, a), (last, b) = ok[0], ok[-1]
+            span = math.log(last / first)
+            line += f"a = {math.log(max(b['seconds'], 1e-6) / max(a['seconds'], 1e-6)) / span:5.2f}  b = {math.log(b['peak_mb'] / a['peak_mb']) / span:5.2f}"
+        if failed:
+            line += f"  fails at {failed[0][0]}x ({failed[0][1]})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the preprocessing functions and analysis stages on generated data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help=f"data sizes to run, as multiples of the current data (e.g. {' '.join(map(str, SCALES))})")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='results to compare against; none is committed, since timings depend on the machine, so the first run has to create it with --save-baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline (needed once before runs can be compared)')
+    parser.add_argument('--timeout', type=float, default=STAGE_TIMEOUT, help='seconds a stage may run before it counts as failed')
+    args = parser.parse_args()
+
+    runs = {str(scale): run_scale(scale, args.timeout) for scale in args.scales}
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline}, so nothing is compared; rerun with --save-baseline to create one on this machine")
+    print_results(runs, baseline)
+    print_scaling(runs)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(runs, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+import raw_cache
+
+
+class CPICube:
+    """
+    CPI values as a 2-D array of products x months.
+
+    The month labels of the wide cpi.csv table ("January 2000", ...) are parsed
+    once into a DatetimeIndex, and products and months are indexed so a single
+    value is an O(1) lookup. Aggregates work on the whole array at once, and a
+    long frame is only built when to_long() is called.
+    """
+
+    def __init__(self, values, products, months):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.products = pd.Index(products, name='Products')
+        self.months = pd.DatetimeIndex(months, name='date')
+        self.product_index = {product: i for i, product in enumerate(self.products)}
+        self.month_index = {month: i for i, month in enumerate(self.months)}
+
+    @classmethod
+    def from_wide(cls, cpi_df):
+        """Build a cube from the wide CPI table with a 'Products' column and one column per month."""
+        month_columns = cpi_df.columns.drop('Products')
+        months = pd.to_datetime(month_columns, format='%B %Y')
+        return cls(cpi_df[month_columns].to_numpy(dtype=np.float64), cpi_df['Products'], months)
+
+    @classmethod
+    def load(cls, cpi_path):
+        """Load cpi.csv through the raw table cache and build a cube."""
+        return cls.from_wide(raw_cache.load_cpi(cpi_path))
+
+    def value(self, product, month):
+        """CPI of one product in one month."""
+        return self.values[self.product_index[product], self.month_index[pd.Timestamp(month)]]
+
+    def series(self, product):
+        """Monthly CPI of one product."""
+        return pd.Series(self.values[self.product_index[product]], index=self.months, name=product)
+
+    def select(self, products=None, exclude=None, start=None, end=None):
+        """Sub-cube restricted to some products and an inclusive month range."""
+        rows = np.arange(len(self.products))
+        if products is not None:
+            rows = np.array([self.product_index[product] for product in products], dtype=int)
+        if exclude is not None:
+            rows = rows[~self.products[rows].isin(exclude)]
+        cols = np.ones(len(self.months), dtype=bool)
+        if start is not None:
+            cols &= self.months >= pd.Timestamp(start)
+        if end is not None:
+            cols &= self.months <= pd.Timestamp(end)
+        return CPICube(self.values[np.ix_(rows, cols)], self.products[rows], self.months[cols])
+
+    def annual_mean(self):
+        """Mean CPI per product and calendar year, skipping missing months (products x years frame)."""
+        # One grouped reduction over the month axis for every product at once
+        by_month = pd.DataFrame(self.values.T, index=pd.Index(self.months.year, name='Year'), columns=self.products)
+        return by_month.groupby(level='Year').mean().T
+
+    def rolling_mean(self, window, min_periods=None):
+        """
+        Trailing mean over `window` months, skipping missing values.
+
+        A window's mean is NaN when it holds fewer than `min_periods` values
+        (default: the whole window), as with DataFrame.rolling. Values and counts
+        are both cumulated, so a missing month only affects the windows it falls in.
+        """
+        if window < 1:
+            raise ValueError(f"window must be at least 1, not {window}")
+        min_periods = window if min_periods is None else max(min_periods, 1)
+        present = ~np.isnan(self.values)
+        zeros = np.zeros((len(self.products), 1))
+        sums = np.cumsum(np.hstack([zeros, np.where(present, self.values, 0.0)]), axis=1)
+        counts = np.cumsum(np.hstack([zeros, present]), axis=1)
+
+        # Window of month i covers months i - window + 1 to i, clipped at the first month
+        ends = np.arange(1, self.values.shape[1] + 1)
+        starts = np.maximum(ends - window, 0)
+        window_sums = sums[:, ends] - sums[:, starts]
+        window_counts = counts[:, ends] - counts[:, starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(window_counts >= min_periods, window_sums / window_counts, np.nan)
+        return pd.DataFrame(means, index=self.products, columns=self.months)
+
+    def to_long(self):
+        """Long frame with one row per product and month, in the order DataFrame.melt produces."""
+        return pd.DataFrame({
+            'Products': np.tile(self.products.to_numpy(), len(self.months)),
+            'CPI': self.values.T.ravel(),
+            'date': np.repeat(self.months.to_numpy(), len(self.products)),
+        })
@@ -0,0 +1,141 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import dimensions
+
+# Typed, partitioned copies of the four preprocessing outputs live here
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datasets')
+# Product, item and province tables; the datasets only store their integer IDs
+DIMENSION_DIR = os.path.join(DATASET_DIR, 'dimensions')
+DATE_COLUMNS = ['date', 'Effective Date']
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PYARROW = True
+except ImportError:
+    # Without pyarrow the analyses fall back to the CSV outputs
+    HAVE_PYARROW = False
+
+
+def dataset_path(name):
+    """Directory of a partitioned dataset, e.g. 'price_wage_data_province'."""
+    return os.path.join(DATASET_DIR, name)
+
+
+def partition_columns(df):
+    """Partition by province when the dataset has one, and always by year."""
+    return ['province_id', 'year'] if 'province_id' in df.columns else ['year']
+
+
+def read_catalog():
+    """The dimension tables written with the datasets, or the default catalog when there are none."""
+    if not HAVE_PYARROW or not os.path.isdir(DIMENSION_DIR):
+        return dimensions.Catalog()
+    frames = {os.path.splitext(file)[0]: pd.read_parquet(os.path.join(DIMENSION_DIR, file)) for file in os.listdir(DIMENSION_DIR) if file.endswith('.parquet')}
+    return dimensions.Catalog.from_frames(frames)
+
+
+def write_catalog(catalog):
+    """Save the dimension tables next to the datasets."""
+    os.makedirs(DIMENSION_DIR, exist_ok=True)
+    for name, frame in catalog.to_frames().items():
+        path = os.path.join(DIMENSION_DIR, f"{name}.parquet")
+        # A stage reading the datasets never sees half a table
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+
+def write_dataset(df, name, append=False, catalog=None):
+    """
+    Write a dataset as Parquet files partitioned by province and year.
+
+    Product, item and province names are stored as integer IDs (product_id, ...)
+    from the catalog, which is saved alongside. With append=True new files are
+    added next to the existing partitions, otherwise the dataset is replaced.
+    """
+    if not HAVE_PYARROW:
+        return
+    path = dataset_path(name)
+    if not append and os.path.exists(path):
+        shutil.rmtree(path)
+
+    catalog = read_catalog() if catalog is None else catalog
+    # Rows without a province keep the MISSING code, which is also their partition
+    df = catalog.encode_frame(df)
+    df['year'] = df['date'].dt.year
+    df.to_parquet(path, partition_cols=partition_columns(df), index=False)
+    write_catalog(catalog)
+
+
+def written_columns(name):
+    """Column order of a dataset as written, from the pandas metadata of one of its files."""
+    import pyarrow.parquet as pq
+
+    for directory, _, files in os.walk(dataset_path(name)):
+        for file in files:
+            if file.endswith('.parquet'):
+                return [column['name'] for column in pq.read_schema(os.path.join(directory, file)).pandas_metadata['columns']]
+    return []
+
+
+def read_dataset(name, columns=None, provinces=None, exclude_provinces=None, years=None, codes=False):
+    """
+    Read a dataset, loading only the requested columns and partitions.
+
+    Parameters:
+    - columns: columns to load, or None for all of them.
+    - provinces / exclude_provinces: province partitions to keep or skip.
+    - years: (first, last) inclusive range of year partitions to read.
+    - codes: return product, item and province as their integer ID columns
+      (product_id, ...) instead of categoricals of the names.
+
+    Returns:
+    - pd.DataFrame: rows ordered by date.
+    """
+    if HAVE_PYARROW and os.path.exists(dataset_path(name)):
+        catalog = read_catalog()
+        filters = []
+        if provinces is not None:
+            filters.append(('province_id', 'in', catalog['province'].lookup(provinces)))
+        if exclude_provinces is not None:
+            filters.append(('province_id', 'not in', catalog['province'].lookup(exclude_provinces)))
+        if years is not None:
+            filters.append(('year', '>=', years[0]))
+            filters.append(('year', '<=', years[1]))
+
+        stored_columns = None if columns is None else [catalog.column(column) for column in columns]
+        df = pd.read_parquet(dataset_path(name), columns=stored_columns, filters=filters or None)
+        if columns is None:
+            # Partition columns come back last, so restore the order the dataset was written in
+            df = df[[column for column in written_columns(name) if column in df.columns]]
+        if 'province_id' in df.columns:
+            # Partition values come back as a categorical of the IDs
+            df['province_id'] = df['province_id'].astype(np.int32)
+        if not codes:
+            df = catalog.decode_frame(df, categorical=True)
+    else:
+        csv_path = os.path.join(os.path.dirname(DATASET_DIR), f"{name}.csv")
+        df = pd.read_csv(csv_path)
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        if provinces is not None:
+            df = df[df['province'].isin(provinces)]
+        if exclude_provinces is not None:
+            df = df[~df['province'].isin(exclude_provinces)]
+        if years is not None:
+            df = df[df['date'].dt.year.between(*years)]
+        if columns is not None:
+            df = df[columns]
+        if codes:
+            df = dimensions.Catalog().encode_frame(df)
+
+    if columns is None and 'year' in df.columns:
+        df = df.drop(columns=['year'])
+    if 'date' in df.columns:
+        df = df.sort_values('date', kind='stable', ignore_index=True)
+    return df
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+import raw_cache
+from cpi_cube import CPICube
+
+# The CPI row every price and wage is deflated by
+PRODUCT = 'All-items'
+# StatCan publishes the CPI with 2002 = 100
+BASE = '2002'
+RESOLUTIONS = ('monthly', 'annual')
+
+
+def month_numbers(dates):
+    """Months since January 1970 of an array of dates."""
+    return dates.values.astype('datetime64[M]').astype(np.int64)
+
+
+def year_numbers(dates):
+    """Calendar years of an array of dates."""
+    return dates.values.astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+class Deflator:
+    """
+    Price levels by month and by year, for turning nominal values into real ones.
+
+    The monthly level is the All-items CPI and the annual level chains the annual
+    percent changes of inflation.csv. Each is an array with one slot per period
+    from its first to its last, so finding the level of any number of dates is
+    one subtraction and one gather rather than a merge. The divisors for a base
+    period are worked out once and cached.
+    """
+
+    def __init__(self, months, monthly_levels, years, annual_changes):
+        months = pd.DatetimeIndex(months)
+        self.first_month = month_numbers(months).min()
+        self.monthly_levels = np.full(month_numbers(months).max() - self.first_month + 1, np.nan)
+        self.monthly_levels[month_numbers(months) - self.first_month] = np.asarray(monthly_levels, dtype=np.float64)
+
+        years = np.asarray(years, dtype=np.int64)
+        self.first_year = years.min()
+        self.annual_changes = np.full(years.max() - self.first_year + 1, np.nan)
+        self.annual_changes[years - self.first_year] = np.asarray(annual_changes, dtype=np.float64)
+        # Level of each year with the year before the first at 1
+        self.annual_levels = np.cumprod(1 + self.annual_changes / 100)
+        self.cache = {}
+
+    @classmethod
+    def from_frames(cls, cpi_df, inflation_df):
+        """Build the deflator from the wide CPI table and the parsed inflation table."""
+        cpi = CPICube.from_wide(cpi_df).series(PRODUCT)
+        inflation = inflation_df.set_index(inflation_df['date'].dt.year)['annual_percent_change']
+        inflation = inflation[~inflation.index.duplicated(keep='last')]
+        return cls(cpi.index, cpi.to_numpy(), inflation.index, inflation.to_numpy())
+
+    @classmethod
+    def load(cls, cpi_path, inflation_path):
+        """Load cpi.csv and inflation.csv through the raw table cache and build the deflator."""
+        return cls.from_frames(raw_cache.load_cpi(cpi_path), raw_cache.load_inflation(inflation_path))
+
+    def table(self, resolution='monthly'):
+        """The price levels as a frame: month (or year), level and, for years, the percent change."""
+        if resolution == 'monthly':
+            months = pd.date_range(pd.Timestamp(np.datetime64(int(self.first_month), 'M')), periods=len(self.monthly_levels), freq='MS', name='date')
+            return pd.DataFrame({'level': self.monthly_levels}, index=months)
+        years = pd.RangeIndex(self.first_year, self.first_year + len(self.annual_levels), name='year')
+        return pd.DataFrame({'level': self.annual_levels, 'annual_percent_change': self.annual_changes}, index=years)
+
+    def base_level(self, base, resolution):
+        """Price level of a base period: a month, or a year (the mean of its months when monthly)."""
+        base = str(base)
+        if resolution == 'annual':
+            position = pd.Timestamp(base).year - self.first_year
+            return self.annual_levels[position] if 0 <= position < len(self.annual_levels) else np.nan
+        if len(base) == 4:
+            positions = np.arange(12) + (int(base) - 1970) * 12 - self.first_month
+        else:
+            positions = month_numbers(pd.DatetimeIndex([base])) - self.first_month
+        positions = positions[(positions >= 0) & (positions < len(self.monthly_levels))]
+        return self.monthly_levels[positions].mean() if len(positions) else np.nan
+
+    def divisors(self, base=BASE, resolution='monthly'):
+        """
+        Divisor of every period that brings its values to the prices of base, cached.
+
+        base='previous' brings each period to the prices of the period before it.
+        For years that is dividing by 1 + annual_percent_change / 100.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {RESOLUTIONS}, not {resolution!r}")
+        key = (resolution, str(base))
+        if key not in self.cache:
+            if base == 'previous' and resolution == 'annual':
+                self.cache[key] = 1 + self.annual_changes / 100
+            elif base == 'previous':
+                self.cache[key] = self.monthly_levels / np.concatenate([[np.nan], self.monthly_levels[:-1]])
+            elif resolution == 'annual':
+                self.cache[key] = self.annual_levels / self.base_level(base, resolution)
+            else:
+                self.cache[key] = self.monthly_levels / self.base_level(base, resolution)
+        return self.cache[key]
+
+    def to_real(self, values, dates, base=BASE, resolution='monthly'):
+        """
+        Deflate nominal values to the prices of a base period.
+
+        Parameters:
+        - values: a value or an array of prices or wages.
+        - dates: the date of each value (or one date for all of them).
+        - base: a month ('2002-06'), a year ('2002' or 2002), or 'previous'.
+        - resolution: 'monthly' (All-items CPI) or 'annual' (inflation.csv).
+
+        Returns:
+        - np.ndarray: the real values, NaN for dates outside the deflator's range.
+        """
+        divisors = self.divisors(base, resolution)
+        # Millions of observations share a few hundred dates, so only the distinct dates are converted to periods
+        codes, dates = pd.factorize(pd.to_datetime(np.atleast_1d(np.asarray(dates))))
+        if resolution == 'monthly':
+            positions = month_numbers(dates) - self.first_month
+        else:
+            positions = year_numbers(dates) - self.first_year
+        inside = (positions >= 0) & (positions < len(divisors))
+        # Dates outside the range, and missing ones (code -1), read NaN
+        by_date = np.full(len(dates) + 1, np.nan)
+        by_date[:-1][inside] = divisors[positions[inside]]
+        return np.asarray(values, dtype=np.float64) / by_date[codes]
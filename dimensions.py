@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# Basket items under their 2024 names; an item's ID is its position in this list
+ITEMS = ['Canned baked beans, 398 millilitres', 'Ground beef, per kilogram', 'Eggs, 1 dozen', 'Apples, per kilogram', 'Bananas, per kilogram', 'Carrots, 1.36 kilograms', 'Whole chicken, per kilogram', 'White bread, 675 grams', 'Potatoes, 4.54 kilograms', 'Onions, per kilogram']
+# The same items as the 2017 table names them, in matching order
+ITEMS_2017 = ['Baked beans, canned, 398 millilitres', 'Ground beef, 1 kilogram', 'Eggs, 1 dozen', 'Apples, 1 kilogram', 'Bananas, 1 kilogram', 'Carrots, 1 kilogram', 'Chicken, 1 kilogram', 'Bread, 675 grams', 'Potatoes, 4.54 kilograms', 'Onions, 1 kilogram']
+# Price factors bringing an old pack size to the one the item has now
+ITEM_FACTORS = {'Carrots, 1 kilogram': 1.36}
+
+PROVINCES = ['Canada', 'Alberta', 'British Columbia', 'Manitoba', 'New Brunswick', 'Newfoundland and Labrador', 'Nova Scotia',
+             'Ontario', 'Prince Edward Island', 'Quebec', 'Saskatchewan', 'Northwest Territories', 'Nunavut', 'Yukon Territories']
+PRODUCTS = ['All-items', 'Food 5', 'Shelter 6', 'Household operations, furnishings and equipment', 'Clothing and footwear', 'Transportation',
+            'Gasoline', 'Health and personal care', 'Recreation, education and reading', 'Alcoholic beverages, tobacco products and recreational cannabis',
+            'All-items excluding food and energy 7', 'All-items excluding energy 7', 'Energy 7', 'Goods 8', 'Services 9']
+
+# Code of a missing name (a CPI row without a province, say)
+MISSING = -1
+
+
+class Dimension:
+    """
+    The names of one dimension (item, province or product) and their integer IDs.
+
+    An ID is the position of its name in `names`. Names never seen before are
+    appended, so an ID handed out once never changes. Aliases are other spellings
+    that share an ID, such as the 2017 item names.
+    """
+
+    def __init__(self, name, names=(), aliases=None):
+        self.name = name
+        self.names = list(names)
+        self.ids = {label: i for i, label in enumerate(self.names)}
+        for alias, label in (aliases or {}).items():
+            self.ids[alias] = self.ids[label]
+
+    @property
+    def column(self):
+        """Column holding the codes of this dimension in the fact tables."""
+        return f"{self.name}_id"
+
+    def add(self, label):
+        """ID of a name, giving it the next free one if it is new."""
+        if label not in self.ids:
+            self.ids[label] = len(self.names)
+            self.names.append(label)
+        return self.ids[label]
+
+    def encode(self, values):
+        """
+        Integer codes of a column of names; missing names get MISSING.
+
+        Only the distinct names are looked up (a categorical column already holds
+        them), so the cost per row is a single integer take.
+        """
+        codes, uniques = pd.factorize(values)
+        ids = np.array([self.add(label) for label in uniques] + [MISSING], dtype=np.int32)
+        return ids[codes]
+
+    def decode(self, codes, categorical=False):
+        """Names of an array of codes, as strings or as a categorical of the names present."""
+        codes = np.asarray(codes, dtype=np.int64)
+        if categorical:
+            present = pd.Categorical.from_codes(codes, categories=self.names).remove_unused_categories()
+            # Categories in name order, as astype('category') gives them, so sorted group-bys keep their order
+            return present.reorder_categories(sorted(present.categories))
+        return np.array(self.names + [np.nan], dtype=object)[codes]
+
+    def lookup(self, labels):
+        """IDs of the given names that the dimension knows."""
+        return [self.ids[label] for label in labels if label in self.ids]
+
+    def containing(self, text):
+        """IDs of the names containing text (case-sensitive)."""
+        return [i for i, label in enumerate(self.names) if text in label]
+
+    def to_frame(self):
+        """The dimension table: one row per ID."""
+        return pd.DataFrame({'id': np.arange(len(self.names), dtype=np.int32), 'name': self.names})
+
+
+class Catalog:
+    """The item, province and product dimensions shared by every dataset and stage."""
+
+    def __init__(self, items=ITEMS, provinces=PROVINCES, products=PRODUCTS):
+        self.dimensions = {
+            'item': Dimension('item', items, aliases=dict(zip(ITEMS_2017, ITEMS))),
+            'province': Dimension('province', provinces),
+            'product': Dimension('product', products),
+        }
+
+    def __getitem__(self, name):
+        return self.dimensions[name]
+
+    @classmethod
+    def from_names(cls, names):
+        """Rebuild a catalog from the names of every dimension, as to_names() gives them."""
+        return cls(names.get('item', ITEMS), names.get('province', PROVINCES), names.get('product', PRODUCTS))
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Rebuild a catalog from the dimension tables written by to_frames()."""
+        return cls.from_names({name: frame.sort_values('id')['name'].tolist() for name, frame in frames.items()})
+
+    def to_names(self):
+        """Names of every dimension in ID order, by dimension."""
+        return {name: list(dimension.names) for name, dimension in self.dimensions.items()}
+
+    def to_frames(self):
+        """Dimension tables by name."""
+        return {name: dimension.to_frame() for name, dimension in self.dimensions.items()}
+
+    def encode_frame(self, df):
+        """Replace the item, province and product columns of a frame by their ID columns, in place of the names."""
+        columns = {}
+        for column in df.columns:
+            if column in self.dimensions:
+                columns[self[column].column] = self[column].encode(df[column])
+            else:
+                columns[column] = df[column].to_numpy()
+        return pd.DataFrame(columns, index=df.index)
+
+    def decode_frame(self, df, categorical=False):
+        """Turn the ID columns of a frame back into name columns."""
+        df = df.copy()
+        for name, dimension in self.dimensions.items():
+            if dimension.column in df.columns:
+                df[dimension.column] = dimension.decode(df[dimension.column].to_numpy(), categorical)
+                df = df.rename(columns={dimension.column: name})
+        return df
+
+    def column(self, column):
+        """The stored column of a name column: its ID column for a dimension, otherwise itself."""
+        return self[column].column if column in self.dimensions else column
+
+
+def canonical_items(items, prices, old_names=ITEMS_2017, names=ITEMS):
+    """
+    Map 2017 item names onto the 2024 names and bring old pack sizes to the current one.
+
+    Works on the distinct names only and then takes codes per row, instead of
+    comparing and replacing strings row by row.
+
+    Returns:
+    - pd.Categorical: the current name of every row, with every item as a category so
+      frames from both tables concatenate without falling back to strings.
+    - np.ndarray: prices with the pack-size factors applied.
+    """
+    codes, uniques = pd.factorize(items)
+    dimension = Dimension('item', names, aliases=dict(zip(old_names, names)))
+    factors = np.array([ITEM_FACTORS.get(label, 1.0) for label in uniques] + [1.0])
+    current = pd.Categorical.from_codes(np.append(dimension.encode(uniques), MISSING)[codes], categories=dimension.names)
+    return current, np.asarray(prices, dtype=np.float64) * factors[codes]
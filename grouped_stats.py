@@ -0,0 +1,204 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Resamples handed to one worker at a time; fixed so results do not depend on the number of workers
+RESAMPLE_CHUNK = 250
+PAIR_BLOCK = 1000
+
+
+class GroupedStats:
+    """
+    Count, sum and sum of squares of a value per group, from one pass over the rows.
+
+    One-way ANOVA and Tukey's HSD only need these three numbers per group, so
+    neither looks at the rows again. Values are shifted by their overall mean
+    before squaring so the within-group sums of squares keep their precision.
+    """
+
+    def __init__(self, groups, counts, sums, sums_of_squares, shift=0.0):
+        self.groups = pd.Index(groups)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self.sums_of_squares = np.asarray(sums_of_squares, dtype=np.float64)
+        self.shift = shift
+
+    @classmethod
+    def from_codes(cls, values, codes, groups):
+        """Aggregate values whose group is given as an integer code into groups."""
+        values = np.asarray(values, dtype=np.float64)
+        shift = values.mean()
+        shifted = values - shift
+        return cls(
+            groups,
+            np.bincount(codes, minlength=len(groups)),
+            np.bincount(codes, weights=shifted, minlength=len(groups)),
+            np.bincount(codes, weights=shifted * shifted, minlength=len(groups)),
+            shift,
+        )
+
+    @classmethod
+    def from_values(cls, values, labels):
+        """Aggregate values by label; groups come out in sorted order."""
+        codes, groups = pd.factorize(np.asarray(labels), sort=True)
+        return cls.from_codes(values, codes, groups)
+
+    def means(self):
+        """Mean of every group."""
+        return self.sums / self.counts + self.shift
+
+    def within_ss(self):
+        """Sum of squared deviations from each group's own mean."""
+        return float(np.sum(self.sums_of_squares - self.sums ** 2 / self.counts))
+
+    def between_ss(self):
+        """Sum of squared deviations of the group means from the overall mean, weighted by size."""
+        grand_mean = self.sums.sum() / self.counts.sum()
+        return float(np.sum(self.counts * (self.sums / self.counts - grand_mean) ** 2))
+
+    def mse(self):
+        """Pooled within-group variance."""
+        return self.within_ss() / (self.counts.sum() - len(self.groups))
+
+    def f_statistic(self):
+        """One-way ANOVA F statistic."""
+        k = len(self.groups)
+        return (self.between_ss() / (k - 1)) / (self.within_ss() / (self.counts.sum() - k))
+
+    def anova(self):
+        """One-way ANOVA F statistic and p-value."""
+        from scipy.stats import f
+
+        statistic = self.f_statistic()
+        return statistic, f.sf(statistic, len(self.groups) - 1, self.counts.sum() - len(self.groups))
+
+    def q_critical(self, alpha=0.05):
+        """Critical value of the studentized range for all the groups."""
+        from scipy.stats import studentized_range
+
+        return studentized_range.ppf(1 - alpha, len(self.groups), self.counts.sum() - len(self.groups))
+
+    def tukey_hsd(self, alpha=0.05):
+        """
+        Tukey-Kramer comparison of every pair of groups.
+
+        Returns:
+        - pd.DataFrame: group1, group2, meandiff, p-adj, lower, upper and reject,
+          rounded like statsmodels' pairwise_tukeyhsd summary.
+        """
+        from scipy.stats import studentized_range
+
+        k = len(self.groups)
+        df = self.counts.sum() - k
+        first, second = np.triu_indices(k, 1)
+        means = self.means()
+        diffs = means[second] - means[first]
+        std_pairs = np.sqrt(self.mse() * (1 / self.counts[first] + 1 / self.counts[second]) / 2)
+        ranges = np.abs(diffs) / std_pairs
+        q_crit = self.q_critical(alpha)
+
+        return pd.DataFrame({
+            'group1': self.groups[first],
+            'group2': self.groups[second],
+            'meandiff': np.round(diffs, 4),
+            'p-adj': np.round(studentized_range.sf(ranges, k, df), 4),
+            'lower': np.round(diffs - q_crit * std_pairs, 4),
+            'upper': np.round(diffs + q_crit * std_pairs, 4),
+            'reject': ranges > q_crit,
+        })
+
+    def halfwidths(self, alpha=0.05):
+        """Half widths of the simultaneous per-group intervals (Hochberg and Tamhane, eq. 3.32)."""
+        k = len(self.groups)
+        first, second = np.triu_indices(k, 1)
+        group_var = self.mse() / self.counts
+        pair_sd = np.sqrt(group_var[first] + group_var[second])
+        d = np.zeros((k, k))
+        d[first, second] = pair_sd
+        d = d + d.T
+        if k > 2:
+            w = ((k - 1) * d.sum(axis=0) - pair_sd.sum()) / ((k - 1) * (k - 2))
+        else:
+            w = np.full(2, pair_sd.sum() / 2)
+        return self.q_critical(alpha) / np.sqrt(2) * w
+
+    def plot_simultaneous(self, ax, alpha=0.05):
+        """Plot every group mean with its simultaneous interval; non-overlapping intervals differ."""
+        means = self.means()
+        halfwidths = self.halfwidths(alpha)
+        ax.errorbar(means, np.arange(len(means)), xerr=halfwidths, marker='o', linestyle='None', color='k', ecolor='k')
+        low, high = np.min(means - halfwidths), np.max(means + halfwidths)
+        ax.set_xlim([low - (high - low) / 10, high + (high - low) / 10])
+        ax.set_ylim([-1, len(means)])
+        ax.set_yticks(np.arange(-1, len(means) + 1))
+        ax.set_yticklabels([''] + self.groups.astype(str).tolist() + [''])
+
+
+def resample_chunk(values, codes, n_groups, n_resamples, seed):
+    """
+    Draw one chunk of resamples.
+
+    Returns:
+    - np.ndarray: group means of n_resamples stratified bootstrap samples (resamples x groups).
+    - np.ndarray: ANOVA F statistics of n_resamples label permutations.
+    """
+    rng = np.random.default_rng(seed)
+    order = np.argsort(codes, kind='stable')
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    row_starts, row_counts = starts[codes], counts[codes]
+    groups = np.arange(n_groups)
+
+    boot_means = np.empty((n_resamples, n_groups))
+    permuted_f = np.empty(n_resamples)
+    for i in range(n_resamples):
+        # Each row is replaced by a random row of its own group
+        picks = row_starts + (rng.random(len(values)) * row_counts).astype(np.int64)
+        boot_means[i] = np.bincount(codes, weights=values[picks], minlength=n_groups) / counts
+        permuted_f[i] = GroupedStats.from_codes(rng.permutation(values), codes, groups).f_statistic()
+    return boot_means, permuted_f
+
+
+def bootstrap(values, labels, n_resamples=1000, alpha=0.05, seed=0, max_workers=None):
+    """
+    Bootstrap confidence intervals for every pairwise mean difference and a permutation ANOVA p-value.
+
+    Resamples are drawn in fixed-size chunks spread over a process pool, each
+    chunk with its own seed, so the result only depends on seed and n_resamples.
+
+    Returns:
+    - pd.DataFrame: group1, group2, meandiff and the percentile interval (lower, upper).
+    - float: share of label permutations whose F statistic is at least the observed one.
+    """
+    if n_resamples < 1:
+        raise ValueError(f"n_resamples must be at least 1, not {n_resamples}")
+    values = np.asarray(values, dtype=np.float64)
+    codes, groups = pd.factorize(np.asarray(labels), sort=True)
+    stats = GroupedStats.from_codes(values, codes, groups)
+
+    chunks = [min(RESAMPLE_CHUNK, n_resamples - start) for start in range(0, n_resamples, RESAMPLE_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(resample_chunk, [values] * len(chunks), [codes] * len(chunks), [len(groups)] * len(chunks), chunks, seeds))
+    boot_means = np.concatenate([means for means, _ in results])
+    permuted_f = np.concatenate([f for _, f in results])
+
+    first, second = np.triu_indices(len(groups), 1)
+    means = stats.means()
+    lower, upper = np.empty(len(first)), np.empty(len(first))
+    # Pairs grow with the square of the groups, so their differences are taken a block at a time
+    for start in range(0, len(first), PAIR_BLOCK):
+        block = slice(start, start + PAIR_BLOCK)
+        diffs = boot_means[:, second[block]] - boot_means[:, first[block]]
+        lower[block], upper[block] = np.percentile(diffs, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    pairs = pd.DataFrame({
+        'group1': groups[first],
+        'group2': groups[second],
+        'meandiff': means[second] - means[first],
+        'lower': lower,
+        'upper': upper,
+    })
+    pvalue = (1 + np.sum(permuted_f >= stats.f_statistic())) / (1 + n_resamples)
+    return pairs, pvalue
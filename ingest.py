@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# One thread per raw source. Threads are enough because the Arrow and pandas C
+# parsers release the GIL while parsing, and reads mostly wait on storage.
+MAX_WORKERS = 5
+
+
+def submit(loaders, max_workers=MAX_WORKERS):
+    """
+    Start every loader at once on a thread pool.
+
+    Parameters:
+    - loaders: dict of name -> function taking no arguments (e.g. a functools.partial).
+
+    Returns:
+    - dict: name -> Future of the loaded frame, so a source can be cleaned as soon as
+      it is ready while the others are still loading.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+    futures = {name: executor.submit(loader) for name, loader in loaders.items()}
+    # The threads finish the loads already submitted and then exit
+    executor.shutdown(wait=False)
+    return futures
+
+
+def load(loaders, max_workers=MAX_WORKERS):
+    """Run every loader at once and wait for all of them; returns name -> frame."""
+    futures = submit(loaders, max_workers)
+    return {name: future.result() for name, future in futures.items()}
@@ -1,42 +1,67 @@
-import subprocess
+import argparse
 import os
+import shutil
+import time
 
-files = [
-    'preprocessing_country_data.py',
-    'preprocessing_province_data.py',
-    'q1-cpi-vs-minwage/q1-cpi-minwage.py',
-    'q2-cpi-minwage-gap/q2-cpi-minwage-gap.py',
-    'q3-min-wage-inflation-change/min_wage_inflation_correlation.py',
-    'q4-inflation-adjusted/q4-inflation-adjusted-comparison.py',
-    'q5-basket-cost-inflation-change/basket_cost_inflation_correlation.py',
-    'q6-num-min-wage-hours-basket-cost/num_hours_worked_for_basket.py',
-    'q7-basket-province-prediction/basket_province_prediction.py'
-]
-
-current_dir = os.getcwd()
-root_dir = os.path.abspath(os.path.join(current_dir, '../../'))
-cpi_wage_data_with_inflation_country = os.path.join(root_dir, 'cpi_wage_data_with_inflation_country.csv')
-price_wage_data_country = os.path.join(root_dir, 'price_wage_data_country.csv')
-cpi_wage_data_with_inflation_province = os.path.join(root_dir, 'cpi_wage_data_with_inflation_province.csv')
-price_wage_data_province = os.path.join(root_dir, 'price_wage_data_province.csv')
-
-env = os.environ.copy()
-env['root_dir'] = root_dir
-env['cpi_wage_data_with_inflation_country'] = cpi_wage_data_with_inflation_country
-env['price_wage_data_country'] = price_wage_data_country
-env['cpi_wage_data_with_inflation_province'] = cpi_wage_data_with_inflation_province
-env['price_wage_data_province'] = price_wage_data_province
-
-for file in files:
-    file_path = os.path.join(current_dir, file)
-    
-    if os.path.exists(file_path):
-        print(f"Running {file}")
-        try:
-            file_dir = os.path.dirname(file_path)
-            result = subprocess.run(['python3', file_path], capture_output=True, text=True, check=True, cwd=file_dir, env=env)
-            print(result.stdout.strip())
-        except subprocess.CalledProcessError as e:
-            print(f"Error with {file}: {e.stderr.strip()}")
+import plots
+import stage_cache
+import tracing
+from pipeline import IMPORT_BUDGET, STAGES, run_pipeline, run_in_process, print_report
+from stage_flags import OUT_OF_CORE_ENV
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the preprocessing and analysis stages.')
+    parser.add_argument('--jobs', type=int, default=None, help='number of stages to run at the same time (default: number of cores)')
+    parser.add_argument('--in-process', action='store_true', help='run every stage inside this interpreter instead of one process per stage')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET, help='seconds a stage may spend being imported before it is flagged (with --in-process)')
+    parser.add_argument('--force', action='store_true', help='run every stage, even those whose inputs, code and declaration are unchanged')
+    parser.add_argument('--out-of-core', action='store_true', help='preprocess price tables partitioned on disk instead of loaded whole, for tables larger than memory')
+    parser.add_argument('--no-plots', action='store_true', help='skip every figure; matplotlib is never imported')
+    parser.add_argument('--profile', action='store_true', help=f"trace every preprocessing function and stage and write a Chrome trace to {tracing.TRACE_PATH}")
+    args = parser.parse_args()
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    trace_dir = os.path.join(current_dir, '.cache', 'trace')
+    if args.profile:
+        # Enabled before the stage environment is copied so every stage process traces too
+        shutil.rmtree(trace_dir, ignore_errors=True)
+        tracing.enable(trace_dir)
+    if args.out_of_core:
+        os.environ[OUT_OF_CORE_ENV] = '1'
+    plot_spool = os.path.join(current_dir, '.cache', 'plots')
+    if args.no_plots:
+        os.environ[plots.NO_PLOTS_ENV] = '1'
+    else:
+        # Stages only leave their plot specs here; the figures are rendered once every stage is done
+        shutil.rmtree(plot_spool, ignore_errors=True)
+        os.environ[plots.SPOOL_ENV] = plot_spool
+    env = os.environ.copy()
+
+    stages = [stage for stage in STAGES if os.path.exists(os.path.join(current_dir, stage['path']))]
+    for stage in STAGES:
+        if stage not in stages:
+            print(f"{stage['path']} does not exist")
+
+    # Stages whose inputs, code and declaration match their last successful run are reused
+    memo = stage_cache.StageMemo(stages, current_dir, plots_enabled=not args.no_plots, force=args.force)
+    if args.in_process:
+        results = run_in_process(stages, current_dir, import_budget=args.import_budget, memo=memo)
     else:
-        print(f"{file} does not exist")
+        results = run_pipeline(stages, current_dir, env, max_workers=args.jobs, memo=memo)
+    memo.save()
+    print_report(results)
+
+    if not args.no_plots:
+        start = time.perf_counter()
+        figures, files = plots.render_spool(plot_spool, max_workers=args.jobs)
+        print(f"\nRendered {figures} figures to {files} files in {time.perf_counter() - start:.2f}s")
+
+    if args.profile:
+        trace_events = tracing.merge(trace_dir, os.path.join(current_dir, tracing.TRACE_PATH))
+        tracing.print_summary(trace_events)
+        print(f"\nTrace written to {tracing.TRACE_PATH} (open it in chrome://tracing or https://ui.perfetto.dev)")
+
+
+if __name__ == "__main__":
+    main()
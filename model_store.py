@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Fitted models, one file per (name, training data and hyperparameters)
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'models')
+# Parameters that change how fast a model trains but not what it learns
+RUNTIME_PARAMS = {'n_jobs', 'verbose'}
+# Rows handed to predict() at a time
+PREDICT_CHUNK = 100_000
+# Hex digits of the model key in a model's file name
+KEY_LENGTH = 16
+
+# Models already loaded by this process, by name
+loaded = {}
+
+
+def model_key(estimator, X, y):
+    """Hash the estimator's class and hyperparameters together with the training frame and target."""
+    params = {key: value for key, value in estimator.get_params().items() if key not in RUNTIME_PARAMS}
+    digest = hashlib.sha256()
+    digest.update(type(estimator).__name__.encode())
+    digest.update(json.dumps(params, sort_keys=True, default=repr).encode())
+    digest.update(json.dumps([str(column) for column in X.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def latest_path(name):
+    """File recording which model file a name currently points to."""
+    return os.path.join(MODEL_DIR, f"{name}.latest")
+
+
+def is_model_file(name, file_name):
+    """Whether file_name is '<name>-<key>.joblib', a model of that name and no other (not '<name>-fold0-<key>.joblib')."""
+    return re.fullmatch(rf"{re.escape(name)}-[0-9a-f]{{{KEY_LENGTH}}}\.joblib", file_name) is not None
+
+
+def fit_cached(name, estimator, X, y):
+    """
+    Fit an estimator, or reload the model fitted earlier on the same data with the same hyperparameters.
+
+    The model is also registered under name, so predict(name, rows) can use it later
+    without retraining. Older models of the same name are removed.
+
+    Returns:
+    - the fitted estimator.
+    """
+    import joblib
+
+    file_name = f"{name}-{model_key(estimator, X, y)[:KEY_LENGTH]}.joblib"
+    path = os.path.join(MODEL_DIR, file_name)
+    if os.path.exists(path):
+        model = joblib.load(path)
+    else:
+        model = estimator.fit(X, y)
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        # Write to a temporary file first so a stage running in parallel never loads half a model
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+        for old in os.listdir(MODEL_DIR):
+            if old != file_name and is_model_file(name, old):
+                os.remove(os.path.join(MODEL_DIR, old))
+
+    # Replaced rather than rewritten in place, so a stage loading the model in parallel never reads an empty pointer
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    tmp_path = f"{latest_path(name)}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(file_name)
+    os.replace(tmp_path, latest_path(name))
+    loaded[name] = model
+    return model
+
+
+def load(name):
+    """Return the model last fitted under name."""
+    import joblib
+
+    if name not in loaded:
+        with open(latest_path(name)) as f:
+            loaded[name] = joblib.load(os.path.join(MODEL_DIR, f.read().strip()))
+    return loaded[name]
+
+
+def predict(name, rows, chunk_rows=PREDICT_CHUNK):
+    """
+    Predict many rows with the model last fitted under name, chunk_rows at a time.
+
+    Parameters:
+    - rows: a DataFrame with the training columns, or rows (list or 2-D array) in that column order.
+
+    Returns:
+    - np.ndarray: one prediction per row.
+    """
+    model = load(name)
+    columns = list(model.feature_names_in_)
+    rows = rows[columns] if isinstance(rows, pd.DataFrame) else pd.DataFrame(np.asarray(rows), columns=columns)
+    if len(rows) <= chunk_rows:
+        return model.predict(rows)
+    return np.concatenate([model.predict(rows.iloc[start:start + chunk_rows]) for start in range(0, len(rows), chunk_rows)])
+
+
+def fit_fold(name, estimator, X_train, y_train, X_valid, y_valid):
+    """Fit (or reload) one cross-validation fold and return its validation score."""
+    return fit_cached(name, estimator, X_train, y_train).score(X_valid, y_valid)
+
+
+def cross_validate(name, estimator, X, y, folds=5, seed=0, max_workers=None):
+    """
+    Score an estimator with k-fold cross-validation, fitting the folds in parallel processes.
+
+    Folds are stratified when every class has at least `folds` rows, and each fold
+    model goes through fit_cached() as '<name>-fold<i>', so reruns on unchanged data
+    only reload them. Each fold trains single-threaded since the folds already use every core.
+
+    Returns:
+    - np.ndarray: the validation score of every fold.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    y = np.asarray(y)
+    _, class_counts = np.unique(y, return_counts=True)
+    if y.dtype.kind in 'OUSb' and class_counts.min() >= folds:
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    else:
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+
+    jobs = []
+    for i, (train, valid) in enumerate(splitter.split(X, y)):
+        fold_estimator = clone(estimator)
+        if 'n_jobs' in fold_estimator.get_params():
+            fold_estimator.set_params(n_jobs=1)
+        jobs.append((f"{name}-fold{i}", fold_estimator, X.iloc[train], y[train], X.iloc[valid], y[valid]))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return np.array(list(executor.map(fit_fold, *zip(*jobs))))
@@ -0,0 +1,300 @@
+import contextlib
+import importlib.util
+import io
+import os
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Seconds a stage module may spend at import time before it is flagged.
+# Heavy libraries belong inside a stage's run(), not at module level.
+IMPORT_BUDGET = 0.25
+
+# Each stage declares the files it reads and writes, relative to the project root.
+# A stage is started as soon as every input produced by another stage is ready.
+STAGES = [
+    {
+        'name': 'preprocessing',
+        'path': 'preprocessing_data.py',
+        'reads': ['raw_data/price-to-17.csv', 'raw_data/price-to-24.csv', 'raw_data/wages.csv', 'raw_data/cpi.csv', 'raw_data/inflation.csv'],
+        'writes': ['price_wage_data_country.csv', 'cpi_wage_data_with_inflation_country.csv', 'price_wage_data_province.csv', 'cpi_wage_data_with_inflation_province.csv', 'preprocessing_manifest.json',
+                   'datasets/price_wage_data_country', 'datasets/cpi_wage_data_with_inflation_country', 'datasets/price_wage_data_province', 'datasets/cpi_wage_data_with_inflation_province', 'datasets/dimensions', 'store.sqlite'],
+    },
+    {
+        'name': 'rolling',
+        'path': 'rolling.py',
+        'reads': ['raw_data/wages.csv', 'raw_data/cpi.csv', 'raw_data/inflation.csv'],
+        'writes': ['rolling_correlations.csv'],
+    },
+    {
+        'name': 'q1',
+        'path': 'q1-cpi-vs-minwage/q1-cpi-minwage.py',
+        'reads': ['raw_data/cpi.csv', 'raw_data/wages.csv'],
+        'writes': ['q1-cpi-vs-minwage/merged_minimum_wage_cpi_data.csv', 'q1-cpi-vs-minwage/cpi_minwage_regressions.csv', 'plots/minimum_wage_vs_cpi.png'],
+    },
+    {
+        'name': 'q2',
+        'path': 'q2-cpi-minwage-gap/q2-cpi-minwage-gap.py',
+        'reads': ['raw_data/cpi.csv', 'raw_data/wages.csv'],
+        'writes': ['q2-cpi-minwage-gap/tukey_hsd_results.csv', 'q2-cpi-minwage-gap/Tukey-HSD-Plot.png', 'q2-cpi-minwage-gap/cpi_wage_gap_analysis.csv', 'plots/tukey.png'],
+    },
+    {
+        'name': 'q3',
+        'path': 'q3-min-wage-inflation-change/min_wage_inflation_correlation.py',
+        'reads': ['store.sqlite'],
+        'writes': ['plots/national_inflation_vs_minimum_wage.png'],
+    },
+    {
+        'name': 'q4',
+        'path': 'q4-inflation-adjusted/q4-inflation-adjusted-comparison.py',
+        'reads': ['raw_data/inflation.csv', 'raw_data/cpi.csv', 'raw_data/wages.csv', 'raw_data/price-to-17.csv', 'raw_data/price-to-24.csv'],
+        'writes': ['q4-inflation-adjusted/real_wage_grocery_comparison.csv', 'plots/minimum_wage_vs_real_grocery_prices.png'],
+    },
+    {
+        'name': 'q5',
+        'path': 'q5-basket-cost-inflation-change/basket_cost_inflation_correlation.py',
+        'reads': ['store.sqlite', 'datasets/price_wage_data_country', 'datasets/dimensions'],
+        'writes': [],
+    },
+    {
+        'name': 'q6',
+        'path': 'q6-num-min-wage-hours-basket-cost/num_hours_worked_for_basket.py',
+        'reads': ['store.sqlite', 'datasets/price_wage_data_country', 'datasets/dimensions'],
+        'writes': ['plots/minimum_wage_vs_mean_basket_cost.png'],
+    },
+    {
+        'name': 'q7',
+        'path': 'q7-basket-province-prediction/basket_province_prediction.py',
+        'reads': ['store.sqlite', 'datasets/price_wage_data_province', 'datasets/dimensions'],
+        'writes': ['plots/basket_cost_by_province.png'],
+    },
+]
+
+
+def run_stage(stage, root_dir, env):
+    """Run a single stage script in its own directory and time it."""
+    file_path = os.path.join(root_dir, stage['path'])
+    start = time.perf_counter()
+    result = subprocess.run(['python3', file_path], capture_output=True, text=True, cwd=os.path.dirname(file_path), env=env)
+    elapsed = time.perf_counter() - start
+    return {
+        'name': stage['name'],
+        'returncode': result.returncode,
+        'elapsed': elapsed,
+        'stdout': result.stdout.strip(),
+        'stderr': result.stderr.strip(),
+    }
+
+
+def missing_inputs(stage, stages, root_dir):
+    """Return the inputs of a stage that no stage produces and that are not on disk."""
+    produced = {path for other in stages for path in other['writes']}
+    return [path for path in stage['reads'] if path not in produced and not os.path.exists(os.path.join(root_dir, path))]
+
+
+def stage_dependencies(stages):
+    """Map every stage name to the names of the stages producing its inputs."""
+    producers = {path: other['name'] for other in stages for path in other['writes']}
+    return {
+        stage['name']: {producers[path] for path in stage['reads'] if path in producers and producers[path] != stage['name']}
+        for stage in stages
+    }
+
+
+def skipped_result(name, reason):
+    """Result record for a stage that was not run."""
+    return {'name': name, 'returncode': None, 'elapsed': 0.0, 'stdout': '', 'stderr': reason}
+
+
+def cached_result(name, stdout=''):
+    """Result record for a stage reused from the stage cache because nothing it depends on changed, with what its last run printed."""
+    return {'name': name, 'returncode': 0, 'elapsed': 0.0, 'stdout': stdout, 'stderr': '', 'cached': True}
+
+
+def run_pipeline(stages, root_dir, env, max_workers=None, memo=None):
+    """
+    Run stages in a process pool, starting each one as soon as its inputs are ready.
+
+    With a stage_cache.StageMemo, stages whose key matches their last successful run are not run again.
+    """
+    dependencies = stage_dependencies(stages)
+    pending = {stage['name']: stage for stage in stages}
+    succeeded = set()
+    results = []
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # A stage reused from the cache can make later stages ready, so scan until nothing changes
+            changed = True
+            while changed:
+                changed = False
+                for name, stage in list(pending.items()):
+                    failed = [dep for dep in dependencies[name] if dep not in pending and dep not in succeeded and dep not in running.values()]
+                    missing = missing_inputs(stage, stages, root_dir)
+                    if failed or missing:
+                        reason = f"upstream failed: {', '.join(sorted(failed))}" if failed else f"missing input: {', '.join(missing)}"
+                        results.append(skipped_result(name, reason))
+                        print(f"Skipping {stage['path']} ({reason})")
+                        del pending[name]
+                    elif dependencies[name] <= succeeded:
+                        del pending[name]
+                        if memo is not None and memo.reuse(stage):
+                            result = cached_result(name, memo.stdout(stage))
+                            results.append(result)
+                            succeeded.add(name)
+                            print(f"Reusing {name} (unchanged)")
+                            if result['stdout']:
+                                print(result['stdout'])
+                            changed = True
+                        else:
+                            print(f"Running {stage['path']}")
+                            running[executor.submit(run_stage, stage, root_dir, env)] = name
+
+            if not running:
+                # Nothing can make progress, so whatever is left waits on a cycle
+                for name in pending:
+                    results.append(skipped_result(name, 'dependency cycle'))
+                    print(f"Skipping {pending[name]['path']} (dependency cycle)")
+                pending.clear()
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result = future.result()
+                results.append(result)
+                if result['returncode'] == 0:
+                    succeeded.add(name)
+                    if memo is not None:
+                        memo.store(next(stage for stage in stages if stage['name'] == name), result['stdout'])
+                    print(f"Finished {name} in {result['elapsed']:.2f}s")
+                    if result['stdout']:
+                        print(result['stdout'])
+                else:
+                    print(f"Error with {name}: {result['stderr']}")
+
+    return results
+
+
+def load_stage_module(stage, root_dir):
+    """Import a stage script as a module without calling its run() entry point."""
+    file_path = os.path.join(root_dir, stage['path'])
+    spec = importlib.util.spec_from_file_location(f"stage_{stage['name']}", file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_stage_in_process(stage, root_dir, import_budget=IMPORT_BUDGET):
+    """Import a stage and call its run() in this interpreter, from the stage's own directory."""
+    stage_dir = os.path.dirname(os.path.join(root_dir, stage['path']))
+    previous_dir = os.getcwd()
+    stdout = io.StringIO()
+    returncode = 0
+    stderr = ''
+    import_time = 0.0
+    start = time.perf_counter()
+    try:
+        os.chdir(stage_dir)
+        with contextlib.redirect_stdout(stdout):
+            module = load_stage_module(stage, root_dir)
+            import_time = time.perf_counter() - start
+            module.run()
+    except Exception:
+        returncode = 1
+        stderr = traceback.format_exc().strip()
+    finally:
+        os.chdir(previous_dir)
+    return {
+        'name': stage['name'],
+        'returncode': returncode,
+        'elapsed': time.perf_counter() - start,
+        'import_time': import_time,
+        'over_budget': import_time > import_budget,
+        'stdout': stdout.getvalue().strip(),
+        'stderr': stderr,
+    }
+
+
+def run_in_process(stages, root_dir, import_budget=IMPORT_BUDGET, memo=None):
+    """Run every stage inside this interpreter so libraries are imported once and stay warm, reusing unchanged stages like run_pipeline()."""
+    # Stages never show figures, and the default GUI backend is slow to start
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    import pandas  # noqa: F401  every stage needs it, so warm it up before timing imports
+
+    dependencies = stage_dependencies(stages)
+    pending = {stage['name']: stage for stage in stages}
+    succeeded = set()
+    results = []
+
+    while pending:
+        ready = [name for name in pending if dependencies[name] <= succeeded]
+        blocked = [name for name in pending if dependencies[name] - succeeded - set(pending)]
+        if not ready and not blocked:
+            for name in pending:
+                results.append(skipped_result(name, 'dependency cycle'))
+                print(f"Skipping {pending[name]['path']} (dependency cycle)")
+            break
+
+        for name in blocked:
+            reason = f"upstream failed: {', '.join(sorted(dependencies[name] - succeeded - set(pending)))}"
+            results.append(skipped_result(name, reason))
+            print(f"Skipping {pending.pop(name)['path']} ({reason})")
+
+        for name in ready:
+            stage = pending.pop(name)
+            missing = missing_inputs(stage, stages, root_dir)
+            if missing:
+                reason = f"missing input: {', '.join(missing)}"
+                results.append(skipped_result(name, reason))
+                print(f"Skipping {stage['path']} ({reason})")
+                continue
+
+            if memo is not None and memo.reuse(stage):
+                result = cached_result(name, memo.stdout(stage))
+                results.append(result)
+                succeeded.add(name)
+                print(f"Reusing {name} (unchanged)")
+                if result['stdout']:
+                    print(result['stdout'])
+                continue
+
+            print(f"Running {stage['path']}")
+            result = run_stage_in_process(stage, root_dir, import_budget)
+            results.append(result)
+            if result['over_budget']:
+                print(f"Warning: importing {name} took {result['import_time']:.2f}s (budget {import_budget:.2f}s)")
+            if result['returncode'] == 0:
+                succeeded.add(name)
+                if memo is not None:
+                    memo.store(stage, result['stdout'])
+                print(f"Finished {name} in {result['elapsed']:.2f}s")
+                if result['stdout']:
+                    print(result['stdout'])
+            else:
+                print(f"Error with {name}: {result['stderr']}")
+
+    return results
+
+
+def print_report(results):
+    """Print wall-clock time and exit status for every stage."""
+    print(f"\n{'stage':<24}{'status':<12}{'time (s)':>10}{'import (s)':>12}")
+    for result in results:
+        if result['returncode'] is None:
+            status = 'skipped'
+        elif result.get('cached'):
+            status = 'cached'
+        elif result['returncode'] == 0:
+            status = 'ok'
+        else:
+            status = f"exit {result['returncode']}"
+        import_time = f"{result['import_time']:.2f}" if 'import_time' in result else '-'
+        if result.get('over_budget'):
+            import_time += ' !'
+        print(f"{result['name']:<24}{status:<12}{result['elapsed']:>10.2f}{import_time:>12}")
@@ -0,0 +1,127 @@
+import hashlib
+import io
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import tracing
+
+# Set by main.py: with --no-plots no figure is drawn, otherwise stages leave their specs in the spool directory
+NO_PLOTS_ENV = 'CPI_NO_PLOTS'
+SPOOL_ENV = 'CPI_PLOT_SPOOL'
+
+
+def plain(value):
+    """Store pandas columns as arrays so specs pickle (and hash) the same way every run."""
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.to_numpy()
+    return value
+
+
+class PlotSpec:
+    """
+    A figure described by the Axes calls that draw it, built without importing matplotlib.
+
+    Any Axes method can be called on a spec (spec.scatter(...), spec.set_title(...)).
+    The call is only recorded, and render_figure() replays it on a real Axes later.
+    """
+
+    def __init__(self, figsize=None, tight_layout=False):
+        self.figsize = figsize
+        self.tight_layout = tight_layout
+        self.calls = []
+        self.targets = []
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+
+        def record(*args, **kwargs):
+            self.calls.append((method, [plain(arg) for arg in args], {key: plain(value) for key, value in kwargs.items()}))
+
+        return record
+
+    def save(self, path, **options):
+        """Add a file to write the figure to, with savefig() options such as dpi."""
+        self.targets.append((os.path.abspath(path), options))
+
+    def key(self, options):
+        """Hash of the drawing and the save options; specs with equal keys produce identical files."""
+        return hashlib.sha256(pickle.dumps((self.figsize, self.tight_layout, self.calls, sorted(options.items())))).hexdigest()
+
+
+def render_figure(spec, options, paths):
+    """Draw a spec once with the Agg backend and write the image to every path."""
+    from matplotlib.figure import Figure
+
+    # A bare Figure renders with Agg and never touches pyplot's global state
+    fig = Figure(figsize=spec.figsize)
+    ax = fig.add_subplot()
+    for method, args, kwargs in spec.calls:
+        getattr(ax, method)(*args, **kwargs)
+    if spec.tight_layout:
+        fig.tight_layout()
+    image = io.BytesIO()
+    fig.savefig(image, format=os.path.splitext(paths[0])[1][1:] or 'png', **options)
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(image.getvalue())
+
+
+@tracing.traced
+def render_specs(specs, max_workers=None):
+    """
+    Render specs in a process pool, drawing each distinct figure only once.
+
+    Returns:
+    - int: figures drawn.
+    - int: files written.
+    """
+    jobs = {}
+    for spec in specs:
+        for path, options in spec.targets:
+            paths = jobs.setdefault(spec.key(options), (spec, options, []))[2]
+            if path not in paths:
+                paths.append(path)
+
+    if len(jobs) == 1:
+        render_figure(*next(iter(jobs.values())))
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(render_figure, *zip(*jobs.values())))
+    return len(jobs), sum(len(paths) for _, _, paths in jobs.values())
+
+
+def publish(name, *specs):
+    """
+    Hand a stage's figures over for rendering once its numeric results are written.
+
+    Skipped with --no-plots. Under main.py the specs are spooled and rendered together
+    after the stages finish; a script run on its own renders them straight away.
+    """
+    if os.environ.get(NO_PLOTS_ENV):
+        return
+    spool_dir = os.environ.get(SPOOL_ENV)
+    if not spool_dir:
+        render_specs(specs)
+        return
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, f"{name}.pkl")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(list(specs), f)
+    os.replace(tmp_path, path)
+
+
+def render_spool(spool_dir, max_workers=None):
+    """Render every spec spooled by the stages; returns the figures drawn and files written."""
+    specs = []
+    if os.path.isdir(spool_dir):
+        for file in sorted(os.listdir(spool_dir)):
+            if file.endswith('.pkl'):
+                with open(os.path.join(spool_dir, file), 'rb') as f:
+                    specs.extend(pickle.load(f))
+    return render_specs(specs, max_workers=max_workers)
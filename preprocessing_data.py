@@ -0,0 +1,408 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+import datasets
+import dimensions
+import ingest
+import preprocessing_country_data as country
+import preprocessing_province_data as province
+import query_store
+import raw_cache
+import statcan_reader
+import tracing
+from stage_flags import OUT_OF_CORE_ENV
+from preprocessing_country_data import items_22, items_24
+
+# Country and province outputs are both produced from one read of every raw source.
+# The price windows below are the union of what the two modules keep.
+PRICE_START_22 = '2000-01'
+PRICE_START_24 = '2017-01'
+
+# Records how far each source has been processed so monthly releases can be appended
+MANIFEST_PATH = 'preprocessing_manifest.json'
+
+PRICE_PATH_22 = 'raw_data/price-to-17.csv'
+PRICE_PATH_24 = 'raw_data/price-to-24.csv'
+WAGE_PATH = 'raw_data/wages.csv'
+CPI_PATH = 'raw_data/cpi.csv'
+INFLATION_PATH = 'raw_data/inflation.csv'
+
+PRICE_COUNTRY_PATH = 'price_wage_data_country.csv'
+PRICE_PROVINCE_PATH = 'price_wage_data_province.csv'
+CPI_COUNTRY_PATH = 'cpi_wage_data_with_inflation_country.csv'
+CPI_PROVINCE_PATH = 'cpi_wage_data_with_inflation_province.csv'
+OUTPUT_PATHS = [PRICE_COUNTRY_PATH, PRICE_PROVINCE_PATH, CPI_COUNTRY_PATH, CPI_PROVINCE_PATH]
+
+# Price tables as the out-of-core mode streams them: (path, first month, last month, products)
+PRICE_SOURCES = [(PRICE_PATH_22, PRICE_START_22, None, items_22), (PRICE_PATH_24, PRICE_START_24, None, items_24)]
+# Spill files of the out-of-core mode: one directory per year and GEO
+PARTITION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'fused-partitions')
+
+
+@tracing.traced
+def load_sources(price_path_22, price_path_24, wage_path, cpi_path, inflation_path):
+    """Read every raw source once and all at the same time, keeping the price rows either output needs."""
+    sources = ingest.load({
+        'df_22': partial(statcan_reader.read_prices, price_path_22, start=PRICE_START_22, products=items_22),
+        'df_24': partial(statcan_reader.read_prices, price_path_24, start=PRICE_START_24, products=items_24),
+        'wage_df': partial(raw_cache.load_wages, wage_path),
+        'cpi_df': partial(country.load_and_reformat_cpi, cpi_path),
+        'inflation_df': partial(country.load_inflation_data, inflation_path),
+    })
+    return sources['df_22'], sources['df_24'], sources['wage_df'], sources['cpi_df'], sources['inflation_df']
+
+
+def normalize_items(df, items_22, items_24):
+    """Rescale carrots to the 1.36 kg pack and map 2017 item names onto the 2024 names, through item codes."""
+    df = df.rename(columns={'REF_DATE': 'date', 'GEO': 'province', 'Products': 'item', 'VALUE': 'price'})
+    df['province'] = df['province'].astype(str)
+    df['item'], df['price'] = dimensions.canonical_items(df['item'], df['price'], items_22, items_24)
+    return df
+
+
+def country_prices(df_22, df_24):
+    """National rows in the date windows used by preprocessing_country_data."""
+    df_22 = df_22[(df_22['province'] == 'Canada') & (df_22['date'].dt.year > 1999)]
+    df_24 = df_24[(df_24['province'] == 'Canada') & (df_24['date'].dt.year >= 2022) & (df_24['date'].dt.month >= 3)]
+    return pd.concat([df_22, df_24], ignore_index=True).drop(columns=['province'])
+
+
+def province_prices(df_22, df_24):
+    """All rows in the date windows used by preprocessing_province_data."""
+    df_22 = df_22[(df_22['date'].dt.year > 1999) & (df_22['date'].dt.year < 2017)]
+    df_24 = df_24[(df_24['date'].dt.year >= 2017) & (df_24['date'].dt.month >= 1)]
+    return pd.concat([df_22, df_24], ignore_index=True)
+
+
+def process_wages(wage_df):
+    """Yearly wages as the country and the province datasets join them."""
+    return country.process_wage_data(wage_df.copy()), province.process_wage_data(wage_df.copy())
+
+
+def build_price_datasets(df_22, df_24, country_wage_df, province_wage_df):
+    """The country and province price-wage datasets from price rows with normalized items."""
+    return {
+        PRICE_COUNTRY_PATH: country.merge_wages_with_prices(country_prices(df_22, df_24), country_wage_df),
+        PRICE_PROVINCE_PATH: province.merge_wages_with_prices(province_prices(df_22, df_24), province_wage_df),
+    }
+
+
+def build_cpi_dataset(module, cpi_df, wage_df, inflation_df):
+    """A CPI-wage dataset, joined to the yearly wages and inflation the way the country or province module does."""
+    return module.add_inflation_change(module.create_cpi_wage_dataset(cpi_df.copy(), wage_df), inflation_df)
+
+
+def build_cpi_datasets(cpi_df, inflation_df, country_wage_df, province_wage_df):
+    """The country and province CPI-wage datasets."""
+    return {
+        CPI_COUNTRY_PATH: build_cpi_dataset(country, cpi_df, country_wage_df, inflation_df),
+        CPI_PROVINCE_PATH: build_cpi_dataset(province, cpi_df, province_wage_df, inflation_df),
+    }
+
+
+@tracing.traced
+def build_datasets(df_22, df_24, wage_df, cpi_df, inflation_df):
+    """Build the country and province price-wage and CPI-wage datasets from shared state."""
+    df_22 = normalize_items(df_22, items_22, items_24)
+    df_24 = normalize_items(df_24, items_22, items_24)
+
+    country_wage_df, province_wage_df = process_wages(wage_df)
+    outputs = build_price_datasets(df_22, df_24, country_wage_df, province_wage_df)
+    outputs.update(build_cpi_datasets(cpi_df, inflation_df, country_wage_df, province_wage_df))
+    return outputs
+
+
+def save_outputs(outputs, catalog, append=False):
+    """Write datasets to their CSV files, Parquet datasets and store tables, or append them to all three."""
+    for output_path, df in outputs.items():
+        name = os.path.splitext(output_path)[0]
+        if append:
+            df.to_csv(output_path, mode='a', header=False, index=False)
+            if not len(df):
+                continue
+        else:
+            country.save_cleaned_data(df, output_path)
+        datasets.write_dataset(df, name, append=append, catalog=catalog)
+        query_store.write_table(df, name, append=append, catalog=catalog)
+
+
+def frame_hash(df):
+    """Hash the values of a DataFrame, independent of its index."""
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+def read_manifest(path=MANIFEST_PATH):
+    """Return the saved watermark manifest, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, path=MANIFEST_PATH):
+    """Atomically save the watermark manifest."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def price_state(df):
+    """Manifest entry of a price table loaded whole: its last REF_DATE and the hash of every row."""
+    return {'watermark': df['REF_DATE'].max().strftime('%Y-%m'), 'history_hash': frame_hash(df)}
+
+
+def build_manifest(prices, cpi_df, cpi_month_column, outputs, catalog):
+    """Record the last REF_DATE and CPI month processed, with a hash of everything up to them, and the IDs given out."""
+    return {
+        'sources': {
+            **prices,
+            CPI_PATH: {'watermark': cpi_month_column, 'history_hash': frame_hash(cpi_df)},
+            WAGE_PATH: {'file_hash': raw_cache.file_hash(WAGE_PATH)},
+            INFLATION_PATH: {'file_hash': raw_cache.file_hash(INFLATION_PATH)},
+        },
+        'outputs': sorted(outputs),
+        'dimensions': catalog.to_names(),
+    }
+
+
+def split_at_watermark(df, date_column, watermark, history_hash):
+    """
+    Split a source into rows after its watermark.
+
+    Returns:
+    - pd.DataFrame or None: the new rows, or None when rows at or before the
+      watermark no longer hash to what was processed (a historical revision).
+    """
+    history = df[df[date_column] <= watermark]
+    if frame_hash(history) != history_hash:
+        return None
+    return df[df[date_column] > watermark]
+
+
+def manifest_catalog(manifest):
+    """
+    The catalog whose IDs the manifest recorded, so a rebuild gives every name the ID it had.
+
+    Stores written before the catalog existed have none recorded, and start from the default one.
+    """
+    if manifest is None or 'dimensions' not in manifest:
+        return dimensions.Catalog()
+    return dimensions.Catalog.from_names(manifest['dimensions'])
+
+
+def stores_current(manifest):
+    """Whether every output the manifest lists is on disk in all three forms and can take appended months."""
+    if manifest is None or not all(os.path.exists(path) for path in manifest['outputs']):
+        return False
+    if datasets.HAVE_PYARROW and not all(os.path.exists(datasets.dataset_path(os.path.splitext(path)[0])) for path in manifest['outputs']):
+        return False
+    if not all(query_store.has_table(os.path.splitext(path)[0]) for path in manifest['outputs']):
+        return False
+    # Stores written before the dimension catalog existed hold names rather than IDs
+    if 'dimensions' not in manifest:
+        return False
+
+    # Wages and inflation are joined on year, so any change to them touches rows already written
+    return all(raw_cache.file_hash(path) == manifest['sources'][path]['file_hash'] for path in (WAGE_PATH, INFLATION_PATH))
+
+
+@tracing.traced
+def find_delta(manifest, df_22, df_24, cpi_df):
+    """Return the new price and CPI rows since the manifest, or None if a full rebuild is needed."""
+    if not stores_current(manifest):
+        return None
+    sources = manifest['sources']
+
+    new_22 = split_at_watermark(df_22, 'REF_DATE', pd.Timestamp(sources[PRICE_PATH_22]['watermark']), sources[PRICE_PATH_22]['history_hash'])
+    new_24 = split_at_watermark(df_24, 'REF_DATE', pd.Timestamp(sources[PRICE_PATH_24]['watermark']), sources[PRICE_PATH_24]['history_hash'])
+    cpi_watermark = pd.to_datetime(sources[CPI_PATH]['watermark'], format='%B %Y')
+    new_cpi = split_at_watermark(cpi_df, 'date', cpi_watermark, sources[CPI_PATH]['history_hash'])
+    if new_22 is None or new_24 is None or new_cpi is None:
+        return None
+    return new_22, new_24, new_cpi
+
+
+@tracing.traced
+def scan_prices(path, start, end, products, watermark=None, chunksize=statcan_reader.CHUNKSIZE):
+    """
+    Stream a price table once for its manifest entry, holding one chunk at a time.
+
+    The hashes match what frame_hash() gives for the table loaded whole, so the
+    manifest is the same in both modes.
+
+    Returns:
+    - dict: 'state', the manifest entry of the table; 'history_hash', the hash of
+      the rows up to watermark; 'new', the rows after it.
+    """
+    digest, history = hashlib.sha256(), hashlib.sha256()
+    last, new_rows = None, []
+    for chunk in statcan_reader.iter_prices(path, start=start, end=end, products=products, chunksize=chunksize):
+        chunk = chunk.assign(REF_DATE=pd.to_datetime(chunk['REF_DATE']))
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        digest.update(hashes.tobytes())
+        if len(chunk):
+            last = chunk['REF_DATE'].max() if last is None else max(last, chunk['REF_DATE'].max())
+        if watermark is not None:
+            before = (chunk['REF_DATE'] <= watermark).to_numpy()
+            history.update(hashes[before].tobytes())
+            new_rows.append(chunk[~before])
+    return {
+        'state': {'watermark': last.strftime('%Y-%m'), 'history_hash': digest.hexdigest()},
+        'history_hash': history.hexdigest(),
+        'new': statcan_reader.concat_chunks(new_rows),
+    }
+
+
+@tracing.traced
+def scan_sources(manifest, full_rebuild=False, chunksize=statcan_reader.CHUNKSIZE):
+    """
+    The out-of-core counterpart of load_sources() and find_delta().
+
+    The price tables are streamed for their manifest entries and for the rows after
+    the manifest's watermarks, which are all that is kept. Wages, CPI and inflation
+    are small and load whole on the ingest threads meanwhile.
+
+    Returns:
+    - dict: manifest entries of the price tables.
+    - pd.DataFrame: the wage, CPI and inflation tables.
+    - tuple or None: the new price and CPI rows, or None if a full rebuild is needed.
+    """
+    later = ingest.submit({
+        'wage_df': partial(raw_cache.load_wages, WAGE_PATH),
+        'cpi_df': partial(country.load_and_reformat_cpi, CPI_PATH),
+        'inflation_df': partial(country.load_inflation_data, INFLATION_PATH),
+    })
+    current = not full_rebuild and stores_current(manifest)
+    scans = {}
+    for path, start, end, products in PRICE_SOURCES:
+        watermark = pd.Timestamp(manifest['sources'][path]['watermark']) if current else None
+        scans[path] = scan_prices(path, start, end, products, watermark, chunksize)
+    wage_df, cpi_df, inflation_df = (later[key].result() for key in ('wage_df', 'cpi_df', 'inflation_df'))
+
+    delta = None
+    if current and all(scan['history_hash'] == manifest['sources'][path]['history_hash'] for path, scan in scans.items()):
+        cpi_source = manifest['sources'][CPI_PATH]
+        new_cpi = split_at_watermark(cpi_df, 'date', pd.to_datetime(cpi_source['watermark'], format='%B %Y'), cpi_source['history_hash'])
+        if new_cpi is not None:
+            delta = scans[PRICE_PATH_22]['new'], scans[PRICE_PATH_24]['new'], new_cpi
+    return {path: scan['state'] for path, scan in scans.items()}, wage_df, cpi_df, inflation_df, delta
+
+
+def partition_output(output_path):
+    """File holding an output's rows inside a partition directory."""
+    return f"output-{os.path.splitext(output_path)[0]}.pkl"
+
+
+def process_partition(directory, country_wage_df, province_wage_df):
+    """Build the country and province price rows of one year and GEO, and store them in its directory."""
+    files = sorted(file for file in os.listdir(directory) if not file.startswith('output-'))
+    df = pd.concat([pd.read_pickle(os.path.join(directory, file)) for file in files], ignore_index=True)
+    df['REF_DATE'] = pd.to_datetime(df['REF_DATE'])
+    df_22 = normalize_items(df[df['row'] < province.SOURCE_STRIDE], items_22, items_24)
+    df_24 = normalize_items(df[df['row'] >= province.SOURCE_STRIDE], items_22, items_24)
+    for output_path, output in build_price_datasets(df_22, df_24, country_wage_df, province_wage_df).items():
+        output.to_pickle(os.path.join(directory, partition_output(output_path)))
+
+
+@tracing.traced
+def combine_partitions(partitions, catalog, sources=len(PRICE_SOURCES)):
+    """
+    Save the processed partitions a source and a year at a time.
+
+    Each table is ordered by REF_DATE and comes after the tables before it, so
+    sorting one source's year on the original row numbers and saving them in turn
+    gives the rows of the in-memory run in the same order. Only one year of one
+    source is held in memory at once.
+    """
+    years = sorted({year for year, _ in partitions})
+    for output_path in (PRICE_COUNTRY_PATH, PRICE_PROVINCE_PATH):
+        written = False
+        for source in range(sources):
+            for year in years:
+                frames = [pd.read_pickle(os.path.join(directory, partition_output(output_path))) for partition_year, directory in partitions if partition_year == year]
+                frames = [df[df['row'] // province.SOURCE_STRIDE == source] for df in frames]
+                frames = [df for df in frames if len(df)]
+                if not frames:
+                    continue
+                df = pd.concat(frames, ignore_index=True).sort_values('row', kind='stable', ignore_index=True).drop(columns=['row'])
+                save_outputs({output_path: df}, catalog, append=written)
+                written = True
+        if not written:
+            country.save_cleaned_data(pd.DataFrame(), output_path)
+
+
+@tracing.traced
+def rebuild_out_of_core(sources, wage_df, cpi_df, inflation_df, catalog, partition_dir=PARTITION_DIR, max_workers=None, chunksize=statcan_reader.CHUNKSIZE):
+    """
+    Rebuild every dataset without holding the price tables or any whole output in memory.
+
+    The tables are split by year and GEO, the partitions are cleaned and joined to
+    the wages in parallel processes, and the results are saved a year at a time.
+    The CPI rows are joined on year too, so the CPI datasets are also built and
+    saved a year at a time. Memory is bounded by a chunk of input, one partition
+    per worker and one year of output.
+    """
+    country_wage_df, province_wage_df = process_wages(wage_df)
+    partitions = province.partition_prices(sources, partition_dir, chunksize)
+    directories = [directory for _, directory in partitions]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(process_partition, directories, [country_wage_df] * len(directories), [province_wage_df] * len(directories)))
+    combine_partitions(partitions, catalog, len(sources))
+    shutil.rmtree(partition_dir, ignore_errors=True)
+
+    # The long CPI table is ordered by date, so its years are consecutive blocks
+    cpi_years = [cpi_year for _, cpi_year in cpi_df.groupby(cpi_df['date'].dt.year, sort=True)]
+    for output_path, module, wages in ((CPI_COUNTRY_PATH, country, country_wage_df), (CPI_PROVINCE_PATH, province, province_wage_df)):
+        for i, cpi_year in enumerate(cpi_years):
+            save_outputs({output_path: build_cpi_dataset(module, cpi_year, wages, inflation_df)}, catalog, append=i > 0)
+
+
+@tracing.traced
+def run(full_rebuild=False, out_of_core=None, max_workers=None):
+    if out_of_core is None:
+        # main.py --out-of-core reaches the stage through the environment
+        out_of_core = bool(os.environ.get(OUT_OF_CORE_ENV))
+    manifest = read_manifest()
+    cpi_month_column = raw_cache.load_cpi(CPI_PATH).columns[-1]
+
+    if out_of_core:
+        prices, wage_df, cpi_df, inflation_df, delta = scan_sources(manifest, full_rebuild)
+    else:
+        df_22, df_24, wage_df, cpi_df, inflation_df = load_sources(PRICE_PATH_22, PRICE_PATH_24, WAGE_PATH, CPI_PATH, INFLATION_PATH)
+        prices = {PRICE_PATH_22: price_state(df_22), PRICE_PATH_24: price_state(df_24)}
+        delta = None if full_rebuild else find_delta(manifest, df_22, df_24, cpi_df)
+
+    # Both stores get the same IDs, rebuilt or appended to. Names already written keep
+    # their IDs and names seen for the first time are appended to the catalog
+    catalog = manifest_catalog(manifest)
+    if delta is None:
+        if out_of_core:
+            rebuild_out_of_core(PRICE_SOURCES, wage_df, cpi_df, inflation_df, catalog, max_workers=max_workers)
+        else:
+            save_outputs(build_datasets(df_22, df_24, wage_df, cpi_df, inflation_df), catalog)
+        print(f"Rebuilt {len(OUTPUT_PATHS)} datasets")
+    else:
+        new_22, new_24, new_cpi = delta
+        if len(new_22) or len(new_24) or len(new_cpi):
+            # Rows are ordered by date within each source, so appending matches a full rebuild
+            save_outputs(build_datasets(new_22, new_24, wage_df, new_cpi, inflation_df), catalog, append=True)
+        print(f"Appended {len(new_22) + len(new_24)} new price rows and {len(new_cpi)} new CPI rows")
+
+    write_manifest(build_manifest(prices, cpi_df, cpi_month_column, OUTPUT_PATHS, catalog))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the country and province datasets.')
+    parser.add_argument('--full', action='store_true', help='rebuild every dataset instead of appending new months')
+    parser.add_argument('--out-of-core', action='store_true', help='partition the price tables by year and GEO on disk instead of loading them whole')
+    parser.add_argument('--jobs', type=int, default=None, help='partitions processed at the same time (default: number of cores)')
+    args = parser.parse_args()
+    run(full_rebuild=args.full, out_of_core=args.out_of_core or None, max_workers=args.jobs)
@@ -2,76 +2,77 @@
 # Takes the average CPI on food using all provinces, for each year
 
 
+import os
+import sys
+
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import plots
+import raw_cache
+from cpi_cube import CPICube
+from regression import GroupedRegression
+import tracing
 
 cpi_file_path = "../raw_data/cpi.csv"
 wages_file_path = "../raw_data/wages.csv"
-cpi_data = pd.read_csv(cpi_file_path)
-wages_data = pd.read_csv(wages_file_path)
-
-# process wages data
-wages_data["Effective Date"] = pd.to_datetime(
-    wages_data["Effective Date"], format="%d-%b-%y", errors="coerce"
-)
-wages_data["Year"] = wages_data["Effective Date"].dt.year
-wages_data["Minimum Wage"] = (
-    wages_data["Minimum Wage"].str.replace(r"[^\d.]", "", regex=True).astype(float)
-)
-
-# wages data from 2000 onwards and calculate average minimum wage for each year
-wages_data_cleaned = wages_data.dropna(subset=["Effective Date"])
-wages_data_cleaned = wages_data_cleaned[wages_data_cleaned["Year"] >= 2000]
-average_wages_all_months = wages_data_cleaned.groupby("Year")["Minimum Wage"].mean()
-
-# process CPI data
-cpi_food_long = cpi_data[cpi_data["Products"] == "Food 5"].melt(
-    id_vars=["Products"], var_name="Month-Year", value_name="CPI Food"
-)
-cpi_food_long["Year"] = cpi_food_long["Month-Year"].str.extract(r"(\d{4})").astype(int)
-cpi_food_long["Month"] = cpi_food_long["Month-Year"].str.extract(r"([a-zA-Z]+)")
-cpi_food_long_filtered = cpi_food_long[cpi_food_long["Year"] >= 2000]
-average_cpi_food_by_year = (
-    cpi_food_long_filtered.groupby("Year")["CPI Food"].mean().reset_index()
-)
-
-# merge average wages and CPI data
-merged_data_all_months = pd.merge(
-    average_wages_all_months, average_cpi_food_by_year, on="Year", how="inner"
-)
-merged_data_all_months.columns = ["Year", "Average Minimum Wage", "Average CPI Food"]
-output_csv_path = "./merged_minimum_wage_cpi_data.csv"
-merged_data_all_months.to_csv(output_csv_path, index=False)
-
-# Linear Regression
-X = merged_data_all_months["Average Minimum Wage"].values.reshape(-1, 1)
-y = merged_data_all_months["Average CPI Food"].values
-
-model_all_months = LinearRegression()
-model_all_months.fit(X, y)
-
-# regression line
-slope_all_months = model_all_months.coef_[0]
-intercept_all_months = model_all_months.intercept_
-
-plt.figure(figsize=(10, 6))
-plt.scatter(
-    merged_data_all_months["Average Minimum Wage"],
-    merged_data_all_months["Average CPI Food"],
-    color="blue",
-    label="Data Points",
-)
-plt.plot(
-    X,
-    model_all_months.predict(X),
-    color="red",
-    label="Regression Line",
-)
-plt.xlabel("Average Minimum Wage")
-plt.ylabel("Average CPI for Food")
-plt.title("Minimum Wage vs CPI for Food (Canada, Annual Averages)")
-plt.legend()
-plt.grid(True)
-# plt.show()
-plt.savefig('../plots/minimum_wage_vs_cpi.png', dpi=300, bbox_inches='tight')
+
+
+@tracing.traced
+def run():
+    cpi_cube = CPICube.load(cpi_file_path)
+    wages_data = raw_cache.load_wages(wages_file_path)
+
+    # process wages data (dates and wages come back already parsed from the raw cache, without rows whose date does not parse)
+    wages_data["Year"] = wages_data["Effective Date"].dt.year
+
+    # wages data from 2000 onwards and calculate average minimum wage for each year
+    wages_data_cleaned = wages_data[wages_data["Year"] >= 2000]
+    average_wages_all_months = wages_data_cleaned.groupby("Year")["Minimum Wage"].mean()
+
+    # process CPI data: annual mean of every CPI category from 2000 onwards
+    cpi_by_year = cpi_cube.select(start="2000-01-01").annual_mean()
+    average_cpi_food_by_year = cpi_by_year.loc["Food 5"].rename("CPI Food").reset_index()
+
+    # merge average wages and CPI data
+    merged_data_all_months = pd.merge(
+        average_wages_all_months, average_cpi_food_by_year, on="Year", how="inner"
+    )
+    merged_data_all_months.columns = ["Year", "Average Minimum Wage", "Average CPI Food"]
+    output_csv_path = "./merged_minimum_wage_cpi_data.csv"
+    merged_data_all_months.to_csv(output_csv_path, index=False)
+
+    # Linear Regression
+    X = merged_data_all_months["Average Minimum Wage"].values.reshape(-1, 1)
+    model_all_months = GroupedRegression.from_frame(merged_data_all_months, "Average Minimum Wage", "Average CPI Food")
+
+    # the same regression for every CPI category, fitted together in one batch
+    cpi_long = cpi_by_year.reset_index().melt(id_vars="Products", var_name="Year", value_name="CPI").dropna()
+    cpi_long = pd.merge(cpi_long, average_wages_all_months.reset_index(), on="Year", how="inner")
+    category_fits = GroupedRegression.from_frame(cpi_long, "Minimum Wage", "CPI", by="Products").fit()
+    category_fits.to_csv("./cpi_minwage_regressions.csv")
+
+    plot = plots.PlotSpec(figsize=(10, 6))
+    plot.scatter(
+        merged_data_all_months["Average Minimum Wage"],
+        merged_data_all_months["Average CPI Food"],
+        color="blue",
+        label="Data Points",
+    )
+    plot.plot(
+        X,
+        model_all_months.predict(X),
+        color="red",
+        label="Regression Line",
+    )
+    plot.set_xlabel("Average Minimum Wage")
+    plot.set_ylabel("Average CPI for Food")
+    plot.set_title("Minimum Wage vs CPI for Food (Canada, Annual Averages)")
+    plot.legend()
+    plot.grid(True)
+    plot.save('../plots/minimum_wage_vs_cpi.png', dpi=300, bbox_inches='tight')
+    plots.publish('q1', plot)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,88 +1,90 @@
+import argparse
+import os
+import sys
+
 import pandas as pd
-from scipy.stats import f_oneway
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
-import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import grouped_stats
+import plots
+import raw_cache
+from cpi_cube import CPICube
+import tracing
 
 cpi_file_path = "../raw_data/cpi.csv"
 wages_file_path = "../raw_data/wages.csv"
 
-cpi_data = pd.read_csv(cpi_file_path)
-wages_data = pd.read_csv(wages_file_path)
-
-# wages data
-wages_data["Effective Date"] = pd.to_datetime(
-    wages_data["Effective Date"], format="%d-%b-%y", errors="coerce"
-)
-wages_data["Year"] = wages_data["Effective Date"].dt.year
-wages_data["Minimum Wage"] = (
-    wages_data["Minimum Wage"].str.replace(r"[^\d.]", "", regex=True).astype(float)
-)
-
-# wages data from 2000 onwards and calculate average minimum wage for each year
-# this is done because our dataset only has minimum wage data for years 2000+
-wages_data_cleaned = wages_data.dropna(subset=["Effective Date"])
-wages_data_cleaned = wages_data_cleaned[wages_data_cleaned["Year"] >= 2000]
-average_wages_all_months = wages_data_cleaned.groupby("Year")["Minimum Wage"].mean()
-
-# CPI data
-cpi_long = cpi_data.melt(
-    id_vars=["Products"], var_name="Month-Year", value_name="CPI"
-)
-cpi_long["Year"] = cpi_long["Month-Year"].str.extract(r"(\d{4})").astype(int)
-cpi_long["Month"] = cpi_long["Month-Year"].str.extract(r"([a-zA-Z]+)")
-cpi_long_filtered = cpi_long[cpi_long["Year"] >= 2000]
-
-# exclude specified products
-excluded_products = [
-    "All-items", 
-    "All-items excluding energy 7", 
-    "All-items excluding food and energy 7"
-]
-cpi_long_filtered = cpi_long_filtered[~cpi_long_filtered["Products"].isin(excluded_products)]
-
-# calculate annual averages for each product
-average_cpi_by_product = cpi_long_filtered.groupby(["Year", "Products"])["CPI"].mean().reset_index()
-
-# merge with wages data to calculate the gap
-merged_data = pd.merge(
-    average_cpi_by_product,
-    average_wages_all_months.reset_index(),
-    on="Year",
-    how="inner"
-)
-merged_data["CPI-Wage Gap"] = merged_data["CPI"] - merged_data["Minimum Wage"]
-
-# ANOVA
-anova_results = f_oneway(
-    *[
-        merged_data[merged_data["Products"] == product]["CPI-Wage Gap"]
-        for product in merged_data["Products"].unique()
+
+@tracing.traced
+def run(resamples=0):
+    cpi_cube = CPICube.load(cpi_file_path)
+    wages_data = raw_cache.load_wages(wages_file_path)
+
+    # wages data (dates and wages come back already parsed from the raw cache, without rows whose date does not parse)
+    wages_data["Year"] = wages_data["Effective Date"].dt.year
+
+    # wages data from 2000 onwards and calculate average minimum wage for each year
+    # this is done because our dataset only has minimum wage data for years 2000+
+    wages_data_cleaned = wages_data[wages_data["Year"] >= 2000]
+    average_wages_all_months = wages_data_cleaned.groupby("Year")["Minimum Wage"].mean()
+
+    # exclude specified products
+    excluded_products = [
+        "All-items", 
+        "All-items excluding energy 7", 
+        "All-items excluding food and energy 7"
     ]
-)
-print(f"ANOVA results: p-value = {anova_results.pvalue}")
-
-# Tukey's HSD
-tukey = pairwise_tukeyhsd(
-    endog=merged_data["CPI-Wage Gap"],
-    groups=merged_data["Products"],  
-    alpha=0.05                        
-)
-
-# Tukey's results
-# print("\nTukey's HSD Test Results:")
-# print(tukey)
-
-tukey_df = pd.DataFrame(data=tukey.summary().data[1:], columns=tukey.summary().data[0])
-tukey_df.to_csv("tukey_hsd_results.csv", index=False)
-
-plt.figure(figsize=(12, 8))
-tukey.plot_simultaneous()
-plt.title("Tukey's HSD Test Results")
-plt.xlabel("CPI-Wage Gap")
-plt.savefig("Tukey-HSD-Plot.png", dpi=600)
-# plt.show()
-plt.savefig('../plots/tukey.png', dpi=300, bbox_inches='tight')
-
-output_csv_path = "./cpi_wage_gap_analysis.csv"
-merged_data.to_csv(output_csv_path, index=False)
-print(f"Merged data saved to {output_csv_path}")
+
+    # calculate annual averages for each product from 2000 onwards
+    annual_cpi = cpi_cube.select(exclude=excluded_products, start="2000-01-01").annual_mean()
+    average_cpi_by_product = (
+        annual_cpi.reset_index()
+        .melt(id_vars="Products", var_name="Year", value_name="CPI")
+        .sort_values(["Year", "Products"], ignore_index=True)[["Year", "Products", "CPI"]]
+    )
+
+    # merge with wages data to calculate the gap
+    merged_data = pd.merge(
+        average_cpi_by_product,
+        average_wages_all_months.reset_index(),
+        on="Year",
+        how="inner"
+    )
+    merged_data["CPI-Wage Gap"] = merged_data["CPI"] - merged_data["Minimum Wage"]
+
+    # per-product count, sum and sum of squares in one pass; ANOVA and Tukey's HSD both come from them
+    gap_stats = grouped_stats.GroupedStats.from_values(merged_data["CPI-Wage Gap"], merged_data["Products"])
+
+    # ANOVA
+    _, anova_pvalue = gap_stats.anova()
+    print(f"ANOVA results: p-value = {anova_pvalue}")
+
+    # Tukey's HSD
+    tukey_df = gap_stats.tukey_hsd(alpha=0.05)
+    tukey_df.to_csv("tukey_hsd_results.csv", index=False)
+
+    # one spec for both files; they keep their own save options, so it is rendered once per file
+    plot = plots.PlotSpec(figsize=(10, 6))
+    gap_stats.plot_simultaneous(plot, alpha=0.05)
+    plot.set_title("Tukey's HSD Test Results")
+    plot.set_xlabel("CPI-Wage Gap")
+    plot.save("Tukey-HSD-Plot.png", dpi=600)
+    plot.save('../plots/tukey.png', dpi=300, bbox_inches='tight')
+
+    # bootstrap intervals for the pairwise differences and a permutation p-value for the ANOVA
+    if resamples:
+        bootstrap_df, permutation_pvalue = grouped_stats.bootstrap(merged_data["CPI-Wage Gap"], merged_data["Products"], n_resamples=resamples)
+        print(f"Permutation ANOVA p-value ({resamples} resamples) = {permutation_pvalue}")
+        bootstrap_df.to_csv("tukey_bootstrap_results.csv", index=False)
+
+    output_csv_path = "./cpi_wage_gap_analysis.csv"
+    merged_data.to_csv(output_csv_path, index=False)
+    print(f"Merged data saved to {output_csv_path}")
+
+    plots.publish('q2', plot)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the CPI-minimum wage gap across products.')
+    parser.add_argument('--resamples', type=int, default=0, help='bootstrap and permutation resamples to draw (0 to skip)')
+    run(resamples=parser.parse_args().resamples)
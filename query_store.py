@@ -0,0 +1,134 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+import dimensions
+
+# The cleaned datasets, one table each, in an indexed SQLite file next to the CSV outputs
+STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'store.sqlite')
+DATE_COLUMNS = ['date', 'Effective Date']
+
+# Indexes per table, matching the filters the analyses use (province, date range, item or product).
+# Tables store the integer IDs of products, items and provinces; the names are in the dimension tables.
+INDEXES = {
+    'price_wage_data_country': [('item_id', 'date')],
+    'price_wage_data_province': [('province_id', 'date', 'item_id')],
+    'cpi_wage_data_with_inflation_country': [('product_id', 'date')],
+    'cpi_wage_data_with_inflation_province': [('product_id', 'date'), ('province_id', 'date')],
+}
+# Prefix of the dimension tables: dimension_item, dimension_province, dimension_product
+DIMENSION_PREFIX = 'dimension_'
+
+
+def connect(path=STORE_PATH):
+    """Open the store; closing() the connection is left to the caller."""
+    return sqlite3.connect(path)
+
+
+def quote(column):
+    """Quote a column name for SQL (some columns contain spaces)."""
+    return '"' + column.replace('"', '""') + '"'
+
+
+def read_catalog(path=STORE_PATH):
+    """The dimension tables of the store, or the default catalog when it has none."""
+    if not has_table(f"{DIMENSION_PREFIX}item", path):
+        return dimensions.Catalog()
+    with closing(connect(path)) as conn:
+        frames = {name: pd.read_sql_query(f"SELECT id, name FROM {DIMENSION_PREFIX}{name}", conn) for name in ('item', 'province', 'product')}
+    return dimensions.Catalog.from_frames(frames)
+
+
+def write_table(df, name, append=False, path=STORE_PATH, catalog=None):
+    """
+    Write a dataset to the store and (re)create its indexes.
+
+    Product, item and province names are stored as integer IDs (product_id, ...)
+    from the catalog, whose dimension tables are rewritten with it. Dates are
+    stored as ISO 'YYYY-MM-DD' text so range filters compare as strings.
+    With append=True the rows are added to the existing table.
+    """
+    catalog = read_catalog(path) if catalog is None else catalog
+    df = catalog.encode_frame(df)
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    with closing(connect(path)) as conn, conn:
+        df.to_sql(name, conn, if_exists='append' if append else 'replace', index=False)
+        for dimension, frame in catalog.to_frames().items():
+            frame.to_sql(f"{DIMENSION_PREFIX}{dimension}", conn, if_exists='replace', index=False)
+        for columns in INDEXES.get(name, []):
+            index_name = f"idx_{name}_{'_'.join(column.replace(' ', '_') for column in columns)}"
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {name} ({', '.join(quote(column) for column in columns)})")
+
+
+def has_table(name, path=STORE_PATH):
+    """Whether the store exists and holds the named dataset."""
+    if not os.path.exists(path):
+        return False
+    with closing(connect(path)) as conn:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def query(name, columns=None, provinces=None, exclude_provinces=None, items=None, products=None,
+          product_contains=None, start=None, end=None, codes=False, path=STORE_PATH):
+    """
+    Read the rows of a dataset matching every given filter, using the table's indexes.
+
+    Parameters:
+    - columns: columns to return, or None for all of them.
+    - provinces / exclude_provinces: provinces to keep or skip.
+    - items / products: exact item or product names to keep.
+    - product_contains: keep products whose name contains this text (case-sensitive).
+    - start / end: inclusive date range, e.g. '2010-01-01' and '2015-12-01'.
+    - codes: return product, item and province as their integer ID columns
+      (product_id, ...) instead of the names.
+
+    Name filters are resolved against the dimension tables first, so the table
+    itself is only filtered on integer IDs.
+
+    Returns:
+    - pd.DataFrame: matching rows in the order they were written, with dates parsed.
+
+    Example: query('price_wage_data_province', provinces=['Ontario'],
+    items=['Eggs, 1 dozen'], start='2010-01-01', end='2015-12-01')
+    """
+    catalog = read_catalog(path)
+    filters = []
+    for dimension, values, negate in (('province', provinces, False), ('province', exclude_provinces, True),
+                                      ('item', items, False), ('product', products, False)):
+        if values is not None:
+            filters.append((dimension, catalog[dimension].lookup(values), negate))
+    if product_contains is not None:
+        # Matched once against the product names (case-sensitive), not against every row
+        filters.append(('product', catalog['product'].containing(product_contains), False))
+
+    conditions, params = [], []
+    for dimension, ids, negate in filters:
+        conditions.append(f"{catalog[dimension].column} {'NOT IN' if negate else 'IN'} ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+        if negate:
+            # Rows without a name are left out, as a NULL name would be
+            conditions.append(f"{catalog[dimension].column} != ?")
+            params.append(dimensions.MISSING)
+    if start is not None:
+        conditions.append("date >= ?")
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        conditions.append("date <= ?")
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+
+    select = '*' if columns is None else ', '.join(quote(catalog.column(column)) for column in columns)
+    sql = f"SELECT {select} FROM {name}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY rowid"
+
+    with closing(connect(path)) as conn:
+        df = pd.read_sql_query(sql, conn, params=params)
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return df if codes else catalog.decode_frame(df)
@@ -0,0 +1,116 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+
+import pandas as pd
+
+import tracing
+
+# Parsed copies of the raw tables live here, one file per (table, content hash)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'raw')
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    # Without pyarrow the parsed frame is pickled, which still stores whole column blocks
+    CACHE_FORMAT = 'pickle'
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_wage_table(df):
+    """Parse effective dates and strip the dollar sign from minimum wages, dropping rows whose date does not parse."""
+    df['Effective Date'] = pd.to_datetime(df['Effective Date'], format="%d-%b-%y", errors="coerce")
+    df = df.dropna(subset=['Effective Date']).reset_index(drop=True)
+    df['Minimum Wage'] = df['Minimum Wage'].astype(str).str.replace(r"[^\d.]", "", regex=True).astype(float)
+    return df
+
+
+def parse_cpi_table(df):
+    """Make sure every month column of the wide CPI table is numeric."""
+    months = df.columns.drop('Products')
+    df[months] = df[months].apply(pd.to_numeric, errors='coerce')
+    return df
+
+
+def parse_inflation_table(df):
+    """Parse the year-end dates of the inflation table."""
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def parser_hash(parse):
+    """Return a short hash of a parser's source, so editing the parser retires its cached tables."""
+    return hashlib.sha256(inspect.getsource(parse).encode()).hexdigest()[:8]
+
+
+def cache_file(path, parse, options=None, source=None):
+    """
+    Cache file of a raw table as parse() gives it.
+
+    Parameters:
+    - options: JSON-serializable arguments that change what parse() keeps, such as row filters.
+    - source: module or function whose source the key is taken from, when parse() relies on helpers; parse itself by default.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = f"{name}-{parse.__name__}-{parser_hash(parse if source is None else source)}"
+    if options is not None:
+        key += '-' + hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()[:8]
+    return os.path.join(CACHE_DIR, f"{key}-{file_hash(path)[:16]}.{CACHE_FORMAT}")
+
+
+def read_cached(cache_path):
+    """Return a cached table, or None when it has not been cached."""
+    if not os.path.exists(cache_path):
+        return None
+    if CACHE_FORMAT == 'parquet':
+        return pd.read_parquet(cache_path)
+    return pd.read_pickle(cache_path)
+
+
+def write_cached(df, cache_path):
+    """Cache a parsed table."""
+    # Write to a temporary file first so stages and ingest threads running in parallel never see half a file
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if CACHE_FORMAT == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache_path)
+
+
+@tracing.traced
+def load_cached(path, parse):
+    """Load a raw CSV through parse(), reusing the cached result while the file and the parser are unchanged."""
+    cache_path = cache_file(path, parse)
+    df = read_cached(cache_path)
+    if df is None:
+        df = parse(pd.read_csv(path))
+        write_cached(df, cache_path)
+    return df
+
+
+def load_wages(path):
+    """Load the minimum wage table with dates and wages parsed."""
+    return load_cached(path, parse_wage_table)
+
+
+def load_cpi(path):
+    """Load the wide CPI table with numeric month columns."""
+    return load_cached(path, parse_cpi_table)
+
+
+def load_inflation(path):
+    """Load the annual inflation table with dates parsed."""
+    return load_cached(path, parse_inflation_table)
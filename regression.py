@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+
+class GroupedRegression:
+    """
+    Independent least-squares fits of y on one or more columns of X, one per group.
+
+    Every fit only needs the cross products of [1, X, y] within its group. Those
+    come from one bincount per pair of columns, so thousands of groups are fitted
+    in a single batched solve rather than one fit per group. Columns are shifted by
+    their overall mean first so the cross products keep their precision.
+    """
+
+    def __init__(self, groups, features, moments, shift):
+        self.groups = groups if isinstance(groups, pd.Index) else pd.Index(groups)
+        self.features = list(features)
+        self.moments = moments
+        self.shift = shift
+
+    @classmethod
+    def from_codes(cls, X, y, codes, groups, features=None):
+        """Accumulate rows whose group is given as an integer code into groups."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        columns = np.column_stack([X, np.asarray(y, dtype=np.float64)])
+        shift = columns.mean(axis=0)
+        columns = np.column_stack([np.ones(len(columns)), columns - shift])
+
+        width = columns.shape[1]
+        moments = np.empty((len(groups), width, width))
+        for i in range(width):
+            for j in range(i, width):
+                moments[:, i, j] = moments[:, j, i] = np.bincount(codes, weights=columns[:, i] * columns[:, j], minlength=len(groups))
+        if features is None:
+            features = [f"x{i}" for i in range(X.shape[1])] if X.shape[1] > 1 else ['x']
+        return cls(groups, features, moments, shift)
+
+    @classmethod
+    def from_frame(cls, frame, x, y, by=None):
+        """
+        Fit y on the x column(s) of a frame for every combination of the `by` columns.
+
+        Parameters:
+        - x: a column name, or a list of them for multiple regression.
+        - by: a column name or list of them; None fits the whole frame as one group.
+        """
+        features = [x] if isinstance(x, str) else list(x)
+        if by is None:
+            codes, groups = np.zeros(len(frame), dtype=np.int64), pd.Index(['all'])
+        elif isinstance(by, str):
+            codes, groups = pd.factorize(frame[by], sort=True)
+            groups = pd.Index(groups, name=by)
+        else:
+            grouped = frame.groupby(list(by), sort=True, observed=True)
+            codes, groups = grouped.ngroup().to_numpy(), grouped.size().index
+        return cls.from_codes(frame[features].to_numpy(), frame[y].to_numpy(), codes, groups, features)
+
+    def solve(self):
+        """
+        Coefficients of every group in shifted coordinates.
+
+        Groups with fewer rows than coefficients, or with a constant column, get NaN.
+
+        Returns:
+        - np.ndarray: (groups x 1 + features) coefficients, the first one the shifted intercept.
+        - np.ndarray: (groups x 1 + features x 1 + features) inverse of X'X.
+        - np.ndarray: which groups could be fitted.
+        """
+        p = len(self.features) + 1
+        xtx = self.moments[:, :p, :p]
+        counts = self.moments[:, 0, 0]
+        valid = (counts > p) & (np.linalg.matrix_rank(xtx) == p)
+        inverse = np.full_like(xtx, np.nan)
+        inverse[valid] = np.linalg.inv(xtx[valid])
+        beta = np.einsum('gij,gj->gi', inverse, self.moments[:, :p, p])
+        return beta, inverse, valid
+
+    def fit(self):
+        """
+        Least-squares fit of every group.
+
+        Returns:
+        - pd.DataFrame indexed by group: n, intercept and one slope per feature, their
+          standard errors and two-sided t-test p-values, r2 and the overall F-test p-value.
+          Single-feature fits use scipy.stats.linregress' names (slope, rvalue, pvalue,
+          stderr, intercept_stderr) instead.
+        """
+        from scipy.stats import f as f_dist
+        from scipy.stats import t as t_dist
+
+        beta, inverse, valid = self.solve()
+        p = len(self.features) + 1
+        counts = self.moments[:, 0, 0]
+        y_sum, yy = self.moments[:, 0, p], self.moments[:, p, p]
+        sse = np.maximum(yy - np.einsum('gi,gi->g', beta, self.moments[:, :p, p]), 0)
+        sst = yy - y_sum ** 2 / counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df = counts - p
+            sigma2 = sse / df
+            r2 = np.where(valid, 1 - sse / sst, np.nan)
+
+            # Back to the original coordinates: only the intercept moves
+            x_shift, y_shift = self.shift[:-1], self.shift[-1]
+            slopes = beta[:, 1:]
+            intercept = beta[:, 0] + y_shift - slopes @ x_shift
+            slope_stderr = np.sqrt(sigma2[:, None] * np.diagonal(inverse, axis1=1, axis2=2)[:, 1:])
+            a = np.concatenate([[1.0], -x_shift])
+            intercept_stderr = np.sqrt(sigma2 * np.einsum('i,gij,j->g', a, inverse, a))
+            slope_pvalues = 2 * t_dist.sf(np.abs(slopes / slope_stderr), df[:, None])
+            f_statistic = ((sst - sse) / (p - 1)) / sigma2
+
+        result = pd.DataFrame({'n': counts.astype(np.int64), 'intercept': intercept}, index=self.groups)
+        if len(self.features) == 1:
+            result['slope'] = slopes[:, 0]
+            result['rvalue'] = np.sign(slopes[:, 0]) * np.sqrt(r2)
+            result['pvalue'] = slope_pvalues[:, 0]
+            result['stderr'] = slope_stderr[:, 0]
+            result['intercept_stderr'] = intercept_stderr
+            return result[['n', 'slope', 'intercept', 'rvalue', 'pvalue', 'stderr', 'intercept_stderr']]
+
+        for i, feature in enumerate(self.features):
+            result[f"slope_{feature}"] = slopes[:, i]
+        result['intercept_stderr'] = intercept_stderr
+        for i, feature in enumerate(self.features):
+            result[f"stderr_{feature}"] = slope_stderr[:, i]
+            result[f"pvalue_{feature}"] = slope_pvalues[:, i]
+        result['r2'] = r2
+        result['f_pvalue'] = f_dist.sf(f_statistic, p - 1, df)
+        return result
+
+    def predict(self, X, group=None):
+        """Predictions of one group's fit (the only group by default) for the rows of X."""
+        fit = self.fit()
+        row = fit.iloc[0] if group is None else fit.loc[group]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        slopes = [row['slope']] if len(self.features) == 1 else [row[f"slope_{feature}"] for feature in self.features]
+        return row['intercept'] + X @ np.asarray(slopes)
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import raw_cache
+import tracing
+from cpi_cube import CPICube
+from wage_index import WageIndex
+
+WAGE_PATH = 'raw_data/wages.csv'
+CPI_PATH = 'raw_data/cpi.csv'
+INFLATION_PATH = 'raw_data/inflation.csv'
+OUTPUT_PATH = 'rolling_correlations.csv'
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'rolling', 'tracker.pkl')
+
+# Trailing windows, in months
+WINDOWS = (12, 60)
+START = '2000-01-01'
+# Variance, relative to the sum of squares, below which a window is taken as constant
+FLAT = 1e-10
+# Every pair of monthly series tracked for each province, as (x, y)
+PAIRS = [('minimum_wage', 'food_cpi'), ('minimum_wage', 'inflation'), ('food_cpi', 'inflation')]
+
+
+class RollingWindow:
+    """
+    Running sums of (x, y) pairs over the last `window` months, for many series at once.
+
+    Adding a month adds the new pair to the sums and takes out the one that left the
+    window, so an update costs O(1) per series however long the window is. The last
+    `window` pairs are kept in a ring buffer for that; the sums are rebuilt from it
+    once per lap of the buffer so rounding errors cannot pile up. Missing values
+    leave the series out for that month.
+    """
+
+    def __init__(self, n_series, window):
+        self.window = window
+        self.buffer = np.full((window, n_series, 2), np.nan)
+        self.position = 0
+        # Per series: count, sum x, sum y, sum x^2, sum y^2, sum xy
+        self.sums = np.zeros((6, n_series))
+
+    @staticmethod
+    def moments(x, y):
+        """Count, sums, sums of squares and cross product of the pairs where both values are known."""
+        known = ~(np.isnan(x) | np.isnan(y))
+        x, y = np.where(known, x, 0.0), np.where(known, y, 0.0)
+        return np.stack([known.astype(np.float64), x, y, x * x, y * y, x * y])
+
+    def add(self, x, y):
+        """Slide the window forward by one month."""
+        old = self.buffer[self.position]
+        self.sums += self.moments(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)) - self.moments(old[:, 0], old[:, 1])
+        old[:, 0], old[:, 1] = x, y
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            self.sums = self.moments(self.buffer[..., 0], self.buffer[..., 1]).sum(axis=1)
+
+    def stats(self):
+        """Correlation and least-squares line of every series over the current window."""
+        n, sx, sy, sxx, syy, sxy = self.sums
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sxy - sx * sy / n
+            var_x = sxx - sx * sx / n
+            var_y = syy - sy * sy / n
+            # A series that stayed flat over the window (a wage between two raises) has no correlation;
+            # the subtraction leaves rounding noise rather than an exact zero, so compare against the sums
+            var_x = np.where(var_x > FLAT * sxx, var_x, np.nan)
+            var_y = np.where(var_y > FLAT * syy, var_y, np.nan)
+            slope = cov / var_x
+            return {
+                'n': n.astype(np.int64),
+                'r': cov / np.sqrt(var_x * var_y),
+                'slope': slope,
+                'intercept': (sy - slope * sx) / n,
+            }
+
+
+class RollingTracker:
+    """
+    Rolling correlations of every tracked pair, for every province and window length.
+
+    The tracker remembers the last month it was fed and a hash of everything fed
+    so far, so a monthly run only adds the new months. When an earlier month was
+    revised, it starts over.
+    """
+
+    def __init__(self, keys, windows=WINDOWS):
+        self.keys = keys
+        self.windows = {window: RollingWindow(len(keys), window) for window in windows}
+        self.last_month = None
+        self.history_hash = None
+
+    @staticmethod
+    def hash_panel(x, y):
+        """Hash of the (x, y) values of a run of months."""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(x).tobytes())
+        digest.update(np.ascontiguousarray(y).tobytes())
+        return digest.hexdigest()
+
+    def is_valid_for(self, keys, months, x, y):
+        """Whether the months already fed are unchanged, so only newer months need adding."""
+        if self.last_month is None or not self.keys.equals(keys) or self.last_month not in months:
+            return False
+        seen = months <= self.last_month
+        return self.hash_panel(x[seen], y[seen]) == self.history_hash
+
+    def update(self, months, x, y):
+        """
+        Feed the months after the last one seen.
+
+        Parameters:
+        - months: DatetimeIndex of the panel rows, in order.
+        - x, y: (months x series) arrays in the order of keys.
+
+        Returns:
+        - pd.DataFrame: window statistics of every series after each new month.
+        """
+        new = np.ones(len(months), dtype=bool) if self.last_month is None else months > self.last_month
+        frames = []
+        for i in np.flatnonzero(new):
+            for window in self.windows.values():
+                window.add(x[i], y[i])
+            frames.append(self.current().assign(date=months[i]))
+        if new.any():
+            self.last_month = months[new][-1]
+            self.history_hash = self.hash_panel(x[months <= self.last_month], y[months <= self.last_month])
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def current(self, windows=None):
+        """Statistics of every series over the current window(s), one row per series and window."""
+        frames = []
+        for window in windows or self.windows:
+            frame = self.keys.to_frame(index=False)
+            frame.insert(len(self.keys.names), 'window', window)
+            frames.append(frame.assign(**self.windows[window].stats()))
+        return pd.concat(frames, ignore_index=True)
+
+    def save(self, path=STATE_PATH):
+        """Store the tracker so the next run picks up where this one stopped."""
+        # Plain arrays rather than the object, so the state loads whichever way this module was imported
+        state = {
+            'keys': self.keys,
+            'last_month': self.last_month,
+            'history_hash': self.history_hash,
+            'windows': {size: (window.buffer, window.position, window.sums) for size, window in self.windows.items()},
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        """The tracker saved by the last run, or None."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        tracker = cls(state['keys'], windows=list(state['windows']))
+        for size, (buffer, position, sums) in state['windows'].items():
+            window = tracker.windows[size]
+            window.buffer, window.position, window.sums = buffer, position, sums
+        tracker.last_month, tracker.history_hash = state['last_month'], state['history_hash']
+        return tracker
+
+
+def monthly_panel(wage_path, cpi_path, inflation_path, start=START):
+    """
+    Minimum wage, food CPI and inflation of every province by month.
+
+    Food CPI and inflation are national, and inflation is the annual rate of the month's year.
+
+    Returns:
+    - pd.DatetimeIndex: the months.
+    - pd.MultiIndex: (province, x, y) of every tracked series.
+    - np.ndarray: x and y, each months x series.
+    """
+    food_cpi = CPICube.load(cpi_path).select(products=['Food 5'], start=start).series('Food 5')
+    months = food_cpi.index
+    wages = WageIndex.load(wage_path).monthly(months[0], months[-1])
+    inflation = raw_cache.load_inflation(inflation_path)
+    annual_inflation = inflation.set_index(inflation['date'].dt.year)['annual_percent_change']
+    annual_inflation = annual_inflation[~annual_inflation.index.duplicated(keep='last')]
+
+    national = {
+        'food_cpi': food_cpi.to_numpy(),
+        'inflation': annual_inflation.reindex(months.year).to_numpy(),
+    }
+    keys = pd.MultiIndex.from_tuples(
+        [(province, x, y) for province in wages.columns for x, y in PAIRS],
+        names=['province', 'x', 'y'],
+    )
+    columns = {name: np.repeat(values[:, None], len(wages.columns), axis=1) for name, values in national.items()}
+    columns['minimum_wage'] = wages.to_numpy()
+    x = np.stack([columns[x_name][:, i] for i in range(len(wages.columns)) for x_name, _ in PAIRS], axis=1)
+    y = np.stack([columns[y_name][:, i] for i in range(len(wages.columns)) for _, y_name in PAIRS], axis=1)
+    return months, keys, x, y
+
+
+@tracing.traced
+def run(full_rebuild=False):
+    """Add the new months to the rolling tracker and append their statistics to OUTPUT_PATH."""
+    months, keys, x, y = monthly_panel(WAGE_PATH, CPI_PATH, INFLATION_PATH)
+    tracker = None if full_rebuild else RollingTracker.load()
+    if tracker is None or not tracker.is_valid_for(keys, months, x, y) or not os.path.exists(OUTPUT_PATH):
+        tracker = RollingTracker(keys)
+        append = False
+    else:
+        append = True
+
+    history = tracker.update(months, x, y)
+    if len(history):
+        history.to_csv(OUTPUT_PATH, mode='a' if append else 'w', header=not append, index=False)
+    tracker.save()
+    print(f"Rolling correlations: {len(history) // max(len(keys) * len(tracker.windows), 1)} new months up to {tracker.last_month:%Y-%m}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update the rolling wage, food CPI and inflation correlations.')
+    parser.add_argument('--full', action='store_true', help='recompute every month instead of only the new ones')
+    run(full_rebuild=parser.parse_args().full)
@@ -0,0 +1,188 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import raw_cache
+
+# Last successful run of every stage: its key, what it printed and a copy of what it wrote
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'stages')
+# Figures are drawn from spooled specs after the stages finish, so they are checked but never copied
+PLOT_EXTENSIONS = ('.png',)
+
+
+def file_digest(path, memo):
+    """SHA-256 of a file, reusing the digest recorded for the same size and modification time."""
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    entry = memo.get(path)
+    if entry is None or entry['signature'] != signature:
+        entry = memo[path] = {'signature': signature, 'sha256': raw_cache.file_hash(path)}
+    return entry['sha256']
+
+
+def source_files(path, root_dir, found=None):
+    """A script and every project module it imports, directly or through other project modules."""
+    found = set() if found is None else found
+    found.add(path)
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module_path = os.path.join(root_dir, f"{name.split('.')[0]}.py")
+            if os.path.exists(module_path) and module_path not in found:
+                source_files(module_path, root_dir, found)
+    return found
+
+
+def stage_key(stage, root_dir, upstream_keys, memo):
+    """
+    Hash everything a stage's outputs depend on.
+
+    That is its declaration, its script and the project modules it imports, the
+    contents of its raw inputs, and the keys of the stages producing its other
+    inputs. Produced inputs are not hashed themselves: they are fully determined
+    by their producer's key.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([stage, sys.version_info[:2]], sort_keys=True).encode())
+    for path in sorted(source_files(os.path.join(root_dir, stage['path']), root_dir)):
+        digest.update(os.path.relpath(path, root_dir).encode())
+        digest.update(file_digest(path, memo).encode())
+    for path in stage['reads']:
+        if path in upstream_keys:
+            digest.update(f"{path}:{upstream_keys[path]}".encode())
+        else:
+            digest.update(f"{path}:{file_digest(os.path.join(root_dir, path), memo)}".encode())
+    return digest.hexdigest()
+
+
+def record_path(name):
+    """File recording the key of a stage's last successful run."""
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+
+def artifact_path(name, path):
+    """Where the copy of one of a stage's outputs is kept."""
+    return os.path.join(CACHE_DIR, name, path)
+
+
+def read_json(path, default):
+    """Load a JSON file, or return default when it does not exist."""
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(data, path):
+    """Atomically save a JSON file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def copy_path(source, target):
+    """Copy a file or a directory tree, replacing whatever is at target."""
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    if os.path.isdir(source):
+        shutil.copytree(source, target)
+    else:
+        shutil.copy2(source, target)
+
+
+def reuse(stage, key, root_dir, plots_enabled):
+    """
+    Whether the stage last succeeded with this key, so running it again would change nothing.
+
+    Missing outputs are restored from the copy taken after that run. Figures cannot be
+    restored, so a stage whose figures are missing (or were skipped with --no-plots) runs again.
+    So does a stage recorded before what it printed was kept, as that could not be shown again.
+    """
+    record = read_json(record_path(stage['name']), None)
+    if record is None or record['key'] != key or 'stdout' not in record:
+        return False
+    for path in stage['writes']:
+        if path.endswith(PLOT_EXTENSIONS):
+            if plots_enabled and (not record['plots'] or not os.path.exists(os.path.join(root_dir, path))):
+                return False
+        elif not os.path.exists(os.path.join(root_dir, path)):
+            if not os.path.exists(artifact_path(stage['name'], path)):
+                return False
+            copy_path(artifact_path(stage['name'], path), os.path.join(root_dir, path))
+    return True
+
+
+def recorded_stdout(name):
+    """What a stage printed on its last successful run, shown again when it is reused."""
+    return read_json(record_path(name), {}).get('stdout', '')
+
+
+def store(stage, key, root_dir, plots_enabled, stdout=''):
+    """Record a successful run of a stage, with what it printed, and keep a copy of its outputs."""
+    shutil.rmtree(os.path.join(CACHE_DIR, stage['name']), ignore_errors=True)
+    for path in stage['writes']:
+        if not path.endswith(PLOT_EXTENSIONS) and os.path.exists(os.path.join(root_dir, path)):
+            copy_path(os.path.join(root_dir, path), artifact_path(stage['name'], path))
+    write_json({'key': key, 'plots': plots_enabled, 'stdout': stdout}, record_path(stage['name']))
+
+
+class StageMemo:
+    """Stage keys of one pipeline run, and the check and record of every stage against them."""
+
+    def __init__(self, stages, root_dir, plots_enabled=True, force=False):
+        self.root_dir = root_dir
+        self.plots_enabled = plots_enabled
+        self.force = force
+        self.producers = {path: stage['name'] for stage in stages for path in stage['writes']}
+        self.keys = {}
+        self.memo = load_memo()
+
+    def key(self, stage):
+        """Key of a stage; the stages producing its inputs must have been keyed first."""
+        if stage['name'] not in self.keys:
+            upstream_keys = {
+                path: self.keys[self.producers[path]]
+                for path in stage['reads']
+                if path in self.producers and self.producers[path] != stage['name']
+            }
+            self.keys[stage['name']] = stage_key(stage, self.root_dir, upstream_keys, self.memo)
+        return self.keys[stage['name']]
+
+    def reuse(self, stage):
+        """Whether the stage can be skipped, restoring its outputs if needed."""
+        return not self.force and reuse(stage, self.key(stage), self.root_dir, self.plots_enabled)
+
+    def stdout(self, stage):
+        """What the stage printed on the run being reused."""
+        return recorded_stdout(stage['name'])
+
+    def store(self, stage, stdout=''):
+        """Record a successful run of the stage and what it printed."""
+        store(stage, self.key(stage), self.root_dir, self.plots_enabled, stdout)
+
+    def save(self):
+        """Keep the file digests for the next run."""
+        save_memo(self.memo)
+
+
+def load_memo():
+    """File digests recorded by earlier runs, by path."""
+    return read_json(os.path.join(CACHE_DIR, 'file_hashes.json'), {})
+
+
+def save_memo(memo):
+    """Keep the file digests for the next run."""
+    write_json(memo, os.path.join(CACHE_DIR, 'file_hashes.json'))
@@ -0,0 +1,5 @@
+# Environment variables main.py sets so its flags reach the stage processes it starts.
+# They live here rather than in pipeline.py so stage modules never import the runner.
+
+# Set by main.py --out-of-core; the preprocessing stage then partitions the price tables on disk
+OUT_OF_CORE_ENV = 'CPI_OUT_OF_CORE'
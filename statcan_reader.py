@@ -0,0 +1,142 @@
+import sys
+
+import pandas as pd
+from pandas.api.types import CategoricalDtype, union_categoricals
+
+import raw_cache
+import tracing
+
+# The only StatCan price columns any stage uses; the other 11 are never read
+PRICE_COLUMNS = ['REF_DATE', 'GEO', 'Products', 'VALUE']
+CHUNKSIZE = 100_000
+# Arrow reads by bytes rather than rows, and its streaming reader parses dozens of
+# blocks ahead of the consumer, so blocks stay small and are gathered into chunks
+BLOCK_SIZE = 1 << 20
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    HAVE_PYARROW = True
+except ImportError:
+    # Without pyarrow the pandas C parser streams the table instead
+    HAVE_PYARROW = False
+
+
+def category_dtype(values):
+    """Categorical dtype restricted to values, or an open one when values is None."""
+    if values is None:
+        return 'category'
+    return CategoricalDtype(categories=list(dict.fromkeys(values)))
+
+
+def read_chunks(path, geos, products, chunksize):
+    """
+    Parse the price columns of a table a chunk at a time, numbered by row across chunks.
+
+    Arrow's streaming CSV reader is used when pyarrow is installed. It parses
+    without holding the GIL, so several tables can load at once on threads.
+    Its small blocks are gathered until a chunk holds chunksize rows.
+    """
+    if not HAVE_PYARROW:
+        yield from pd.read_csv(
+            path,
+            usecols=PRICE_COLUMNS,
+            dtype={'REF_DATE': str, 'GEO': category_dtype(geos), 'Products': category_dtype(products), 'VALUE': 'float64'},
+            chunksize=chunksize,
+        )
+        return
+
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=PRICE_COLUMNS,
+            column_types={'REF_DATE': pa.string(), 'GEO': pa.string(), 'Products': pa.string(), 'VALUE': pa.float64()},
+        ),
+    )
+    start = 0
+    batches = []
+    rows = 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows < chunksize:
+            continue
+        yield to_chunk(batches, start, geos, products)
+        start += rows
+        batches = []
+        rows = 0
+    if batches:
+        yield to_chunk(batches, start, geos, products)
+
+
+def to_chunk(batches, start, geos, products):
+    """Convert Arrow record batches to one pandas chunk whose index starts at start."""
+    chunk = pa.Table.from_batches(batches).to_pandas()
+    chunk.index = pd.RangeIndex(start, start + len(chunk))
+    return chunk.astype({'GEO': category_dtype(geos), 'Products': category_dtype(products)})
+
+
+def iter_prices(path, geos=None, start=None, end=None, products=None, chunksize=CHUNKSIZE):
+    """
+    Yield the rows of a StatCan price table matching the filters, one chunk at a time.
+
+    Takes the same filters as read_prices(). REF_DATE is left as its 'YYYY-MM' string
+    and each chunk has its own categories, so only one chunk is in memory at a time.
+    """
+    for chunk in read_chunks(path, geos, products, chunksize):
+        # REF_DATE is zero-padded 'YYYY-MM', so the range check can run on the raw strings
+        mask = chunk['GEO'].notna() & chunk['Products'].notna()
+        if start is not None:
+            mask &= chunk['REF_DATE'] >= start
+        if end is not None:
+            mask &= chunk['REF_DATE'] <= end
+        yield chunk[mask]
+
+
+@tracing.traced
+def read_prices(path, geos=None, start=None, end=None, products=None, chunksize=CHUNKSIZE):
+    """
+    Stream a StatCan price table and keep only the rows matching the filters.
+
+    The result is cached under .cache/raw/ by file contents, filters and the source
+    of this module, so later runs read it back instead of parsing the table again.
+
+    Only REF_DATE, GEO, Products and VALUE are parsed, with GEO and Products as
+    categoricals. When geos or products are given the parser maps every other
+    value to NaN, so unwanted rows are dropped chunk by chunk and peak memory is
+    bounded by the chunk size plus the rows kept.
+
+    Parameters:
+    - geos: GEO values to keep, or None for all.
+    - start, end: inclusive 'YYYY-MM' bounds on REF_DATE, or None for open ends.
+    - products: Products values to keep, or None for all.
+
+    Returns:
+    - pd.DataFrame: REF_DATE (datetime), GEO, Products and VALUE.
+    """
+    # The chunk size only changes how the table is read, so it is not part of the key
+    options = {'geos': geos, 'start': start, 'end': end, 'products': products}
+    cache_path = raw_cache.cache_file(path, read_prices, options, source=sys.modules[__name__])
+    df = raw_cache.read_cached(cache_path)
+    if df is not None:
+        return df
+
+    df = concat_chunks(list(iter_prices(path, geos, start, end, products, chunksize)))
+    df['REF_DATE'] = pd.to_datetime(df['REF_DATE'])
+    raw_cache.write_cached(df, cache_path)
+    return df
+
+
+def concat_chunks(chunks):
+    """Concatenate chunks from iter_prices(), keeping GEO and Products categorical."""
+    if not chunks:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+
+    # Categories can differ between chunks when no filter fixed them up front
+    geo = union_categoricals([chunk['GEO'] for chunk in chunks])
+    item = union_categoricals([chunk['Products'] for chunk in chunks])
+    df = pd.concat(chunks, ignore_index=True)
+    df['GEO'] = pd.Categorical(geo)
+    df['Products'] = pd.Categorical(item)
+    return df[PRICE_COLUMNS]
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cpi_cube import CPICube
+
+
+def cube():
+    values = np.array([
+        [100.0, 101.0, np.nan, 103.0, 104.0, 105.0, 106.0],
+        [90.0, 91.5, 92.0, 92.5, np.nan, np.nan, 95.0],
+    ])
+    return CPICube(values, ['All-items', 'Food 5'], pd.date_range('2020-01-01', periods=7, freq='MS'))
+
+
+@pytest.mark.parametrize('window, min_periods', [(1, None), (3, None), (3, 1), (3, 2), (7, None), (9, None)])
+def test_rolling_mean_matches_pandas(window, min_periods):
+    c = cube()
+    expected = pd.DataFrame(c.values, index=c.products, columns=c.months).T.rolling(window, min_periods=min_periods).mean().T
+    pd.testing.assert_frame_equal(c.rolling_mean(window, min_periods), expected)
+
+
+def test_missing_month_only_affects_its_windows():
+    means = cube().rolling_mean(2)
+    assert np.isnan(means.iloc[0, 2]) and np.isnan(means.iloc[0, 3])
+    assert means.iloc[0, 4] == 103.5
+
+
+def test_rolling_mean_rejects_empty_window():
+    with pytest.raises(ValueError):
+        cube().rolling_mean(0)
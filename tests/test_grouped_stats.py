@@ -0,0 +1,15 @@
+import pytest
+
+import grouped_stats
+
+
+@pytest.mark.parametrize('n_resamples', [0, -1])
+def test_bootstrap_rejects_no_resamples(n_resamples):
+    with pytest.raises(ValueError, match='n_resamples'):
+        grouped_stats.bootstrap([1.0, 2.0, 3.0, 4.0], ['a', 'a', 'b', 'b'], n_resamples=n_resamples)
+
+
+def test_bootstrap_with_one_resample():
+    pairs, pvalue = grouped_stats.bootstrap([1.0, 2.0, 3.0, 4.0], ['a', 'a', 'b', 'b'], n_resamples=1, max_workers=1)
+    assert pairs[['group1', 'group2']].values.tolist() == [['a', 'b']]
+    assert 0 < pvalue <= 1
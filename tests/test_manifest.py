@@ -0,0 +1,14 @@
+import dimensions
+import preprocessing_data as fused
+
+
+def test_rebuild_keeps_recorded_ids():
+    names = dimensions.Catalog().to_names()
+    # A name an earlier run appended keeps its ID through a rebuild
+    names['province'].append('Yukon (retired)')
+    assert fused.manifest_catalog({'dimensions': names}).to_names() == names
+
+
+def test_manifest_without_catalog_starts_from_default():
+    assert fused.manifest_catalog(None).to_names() == dimensions.Catalog().to_names()
+    assert fused.manifest_catalog({'sources': {}, 'outputs': []}).to_names() == dimensions.Catalog().to_names()
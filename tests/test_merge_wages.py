@@ -0,0 +1,73 @@
+import pandas as pd
+
+import preprocessing_province_data as province
+
+
+def merge_wages_with_prices_apply(combined_df, wage_df):
+    """The row-wise implementation merge_wages_with_prices replaced, kept as the reference."""
+    provinces = [
+        "Alberta",
+        "British Columbia",
+        "Manitoba",
+        "New Brunswick",
+        "Newfoundland and Labrador",
+        "Nova Scotia",
+        "Ontario",
+        "Prince Edward Island",
+        "Quebec",
+        "Saskatchewan"
+    ]
+    combined_df['year'] = combined_df['date'].dt.year
+
+    year_mean_wage = wage_df.groupby('year')['Minimum Wage'].mean().reset_index()
+    year_mean_wage.rename(columns={'Minimum Wage': 'mean_wage'}, inplace=True)
+
+    combined_df = combined_df.merge(wage_df, on=['province', 'year'], how='left')
+
+    year_mean_wage = year_mean_wage.groupby('year', as_index=False)['mean_wage'].mean()
+    combined_df = combined_df.merge(year_mean_wage, on='year', how='left')
+
+    combined_df['min_wage'] = combined_df.apply(
+        lambda x: x['mean_wage'] if x['province'] not in provinces else x['Minimum Wage'], axis=1
+    )
+
+    combined_df.drop(columns=['year', 'mean_wage', 'Minimum Wage'], inplace=True)
+    return combined_df
+
+
+def wage_table():
+    """A raw wage table with several rates in one year, a territory, and no rates at all in 2003."""
+    raw = pd.DataFrame({
+        'province': ['Alberta', 'Alberta', 'Alberta', 'Ontario', 'Ontario', 'Ontario', 'Nunavut', 'Quebec'],
+        'Effective Date': ['01-Oct-01', '01-Apr-01', '01-Sep-02', '01-Jan-01', '01-Jul-02', '01-Jan-04', '01-Mar-02', '01-May-04'],
+        'Minimum Wage': ['$5.90', '$5.65', '$6.00', '$6.85', '$7.00', '$7.15', '$8.50', '$7.45'],
+        'Note': ['', '', '', '', '', '', '', ''],
+    })
+    return province.process_wage_data(raw)
+
+
+def price_table():
+    """Monthly prices for provinces, national rows and a region that is neither, across years with and without wages."""
+    dates = pd.to_datetime(['2001-01-01', '2001-06-01', '2002-03-01', '2003-07-01', '2004-02-01', '2005-01-01'])
+    regions = ['Alberta', 'Ontario', 'Quebec', 'Canada', 'Nunavut', 'Manitoba']
+    rows = [(date, region, item, 1.0 + i) for i, (date, region, item) in enumerate(
+        (date, region, item) for date in dates for region in regions for item in ('Eggs, 1 dozen', 'Bananas, per kilogram'))]
+    return pd.DataFrame(rows, columns=['date', 'province', 'item', 'price'])
+
+
+def test_merge_matches_row_wise_reference():
+    wage_df = wage_table()
+    expected = merge_wages_with_prices_apply(price_table(), wage_df.copy())
+    result = province.merge_wages_with_prices(price_table(), wage_df.copy())
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_rows_without_wages_stay_missing():
+    result = province.merge_wages_with_prices(price_table(), wage_table())
+    # No province set a rate in 2003 and Manitoba never did, so those rows have no wage
+    assert result.loc[result['date'].dt.year == 2003, 'min_wage'].isna().all()
+    assert result.loc[result['province'] == 'Manitoba', 'min_wage'].isna().all()
+    # Nunavut is not one of the ten provinces, so it takes the yearly mean like Canada does
+    nunavut = result[(result['province'] == 'Nunavut') & (result['date'].dt.year == 2002)]
+    canada = result[(result['province'] == 'Canada') & (result['date'].dt.year == 2002)]
+    assert nunavut['min_wage'].tolist() == canada['min_wage'].tolist()
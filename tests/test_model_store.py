@@ -0,0 +1,39 @@
+import os
+
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import model_store
+
+
+def training_data(offset=0.0):
+    X = pd.DataFrame({'x': [1.0, 2.0, 3.0, 4.0]})
+    return X, X['x'] * 2 + offset
+
+
+def test_refit_removes_only_older_models_of_the_same_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, 'MODEL_DIR', str(tmp_path))
+    model_store.fit_cached('basket', LinearRegression(), *training_data())
+    model_store.fit_cached('basket-fold0', LinearRegression(), *training_data())
+    # Another name starting with 'basket-' whose suffix is as long as a key
+    (tmp_path / 'basket-fold0-abcdefghij.joblib').write_bytes(b'')
+
+    model_store.fit_cached('basket', LinearRegression(), *training_data(offset=1.0))
+    files = sorted(os.listdir(tmp_path))
+    assert [file for file in files if model_store.is_model_file('basket', file)] == [open(tmp_path / 'basket.latest').read()]
+    assert sum(model_store.is_model_file('basket-fold0', file) for file in files) == 1
+    assert 'basket-fold0-abcdefghij.joblib' in files
+
+
+def test_latest_pointer_is_replaced_not_rewritten(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, 'MODEL_DIR', str(tmp_path))
+    model_store.fit_cached('basket', LinearRegression(), *training_data())
+    pointer = os.stat(tmp_path / 'basket.latest').st_ino
+
+    model_store.fit_cached('basket', LinearRegression(), *training_data(offset=1.0))
+    # A new file took the old one's place, so a reader holding the old one still read it whole
+    assert os.stat(tmp_path / 'basket.latest').st_ino != pointer
+    assert not [file for file in os.listdir(tmp_path) if file.endswith('.tmp')]
+    model_store.loaded.clear()
+    assert model_store.predict('basket', [[5.0]])[0] == pytest.approx(11.0)
@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+import dimensions
+import preprocessing_country_data as country
+import preprocessing_data as fused
+import raw_cache
+import statcan_reader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEADER = 'REF_DATE,GEO,DGUID,Products,UOM,UOM_ID,SCALAR_FACTOR,SCALAR_ID,VECTOR,COORDINATE,VALUE,STATUS,SYMBOL,TERMINATED,DECIMALS'
+
+
+def write_price_table(path, months, items):
+    """A StatCan price table with national and province rows, basket items and one item no output keeps."""
+    lines = [HEADER]
+    for m, month in enumerate(months):
+        for g, geo in enumerate(['Canada', 'Alberta', 'Ontario']):
+            for i, item in enumerate(items + ['Coffee, roasted, 300 grams']):
+                lines.append(f'{month},{geo},x,"{item}",Dollars,81,units,0,v{i},1.1,{1 + m + g / 10 + i / 100:.2f},,,,2')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def months(first, last):
+    return [period.strftime('%Y-%m') for period in pd.period_range(first, last, freq='M')]
+
+
+def test_out_of_core_matches_in_memory(tmp_path, monkeypatch):
+    path_22, path_24 = str(tmp_path / 'price-to-17.csv'), str(tmp_path / 'price-to-24.csv')
+    # The tables overlap in 2017, and the 2024 table starts before the country window opens in March 2022
+    write_price_table(path_22, months('1999-10', '2017-03'), fused.items_22)
+    write_price_table(path_24, months('2016-11', '2023-04'), fused.items_24)
+    sources = [(path_22, fused.PRICE_START_22, None, fused.items_22), (path_24, fused.PRICE_START_24, None, fused.items_24)]
+
+    wage_df = raw_cache.load_wages(os.path.join(ROOT, 'raw_data', 'wages.csv'))
+    cpi_df = country.load_and_reformat_cpi(os.path.join(ROOT, 'raw_data', 'cpi.csv'))
+    inflation_df = country.load_inflation_data(os.path.join(ROOT, 'raw_data', 'inflation.csv'))
+
+    df_22, df_24 = (statcan_reader.read_prices(path, start=start, end=end, products=products) for path, start, end, products in sources)
+    expected = fused.build_datasets(df_22, df_24, wage_df.copy(), cpi_df.copy(), inflation_df)
+
+    saved = {}
+    def save_outputs(outputs, catalog, append=False):
+        for output_path, df in outputs.items():
+            assert append == (output_path in saved)
+            saved.setdefault(output_path, []).append(df)
+    monkeypatch.setattr(fused, 'save_outputs', save_outputs)
+    monkeypatch.chdir(tmp_path)
+    # Small blocks and chunks split the tables across many chunks
+    monkeypatch.setattr(statcan_reader, 'BLOCK_SIZE', 1 << 12)
+    fused.rebuild_out_of_core(sources, wage_df.copy(), cpi_df.copy(), inflation_df, dimensions.Catalog(),
+                              partition_dir=str(tmp_path / 'partitions'), max_workers=2, chunksize=50)
+
+    assert set(saved) == set(expected)
+    for output_path, df in expected.items():
+        assert len(df)
+        result = pd.concat(saved[output_path], ignore_index=True)
+        pd.testing.assert_frame_equal(result, df.reset_index(drop=True))
+    assert not os.path.exists(tmp_path / 'partitions')
@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+
+import raw_cache
+import statcan_reader
+
+HEADER = 'REF_DATE,GEO,DGUID,Products,UOM,UOM_ID,SCALAR_FACTOR,SCALAR_ID,VECTOR,COORDINATE,VALUE,STATUS,SYMBOL,TERMINATED,DECIMALS'
+
+
+def write_price_table(path):
+    lines = [HEADER]
+    for month in ('2016-12', '2017-01', '2017-02'):
+        for geo in ('Canada', 'Alberta'):
+            for item in ('Eggs, 1 dozen', 'Coffee, roasted, 300 grams'):
+                lines.append(f'{month},{geo},x,"{item}",Dollars,81,units,0,v0,1.1,{len(lines)}.5,,,,2')
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def test_price_table_is_read_back_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(raw_cache, 'CACHE_DIR', str(tmp_path / 'raw'))
+    path = tmp_path / 'price.csv'
+    write_price_table(path)
+
+    first = statcan_reader.read_prices(str(path), geos=['Canada'], start='2017-01', products=['Eggs, 1 dozen'])
+    assert len(os.listdir(tmp_path / 'raw')) == 1
+    # Parsing again would fail, so the second read has to come from the cache
+    monkeypatch.setattr(statcan_reader, 'iter_prices', None)
+    second = statcan_reader.read_prices(str(path), geos=['Canada'], start='2017-01', products=['Eggs, 1 dozen'])
+    pd.testing.assert_frame_equal(second, first)
+    assert len(first) == 2
+
+
+def test_filters_and_contents_key_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(raw_cache, 'CACHE_DIR', str(tmp_path / 'raw'))
+    path = tmp_path / 'price.csv'
+    write_price_table(path)
+
+    everything = statcan_reader.read_prices(str(path))
+    canada = statcan_reader.read_prices(str(path), geos=['Canada'])
+    assert len(everything) == 12 and len(canada) == 6
+
+    # A revised table is parsed again instead of served from the old entry
+    path.write_text(path.read_text().replace('2017-02,Canada', '2017-03,Canada'))
+    revised = statcan_reader.read_prices(str(path), geos=['Canada'])
+    assert revised['REF_DATE'].max() == pd.Timestamp('2017-03-01')
+    assert len(os.listdir(tmp_path / 'raw')) == 3
+
+
+def test_wage_rows_with_bad_dates_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(raw_cache, 'CACHE_DIR', str(tmp_path / 'raw'))
+    path = tmp_path / 'wages.csv'
+    path.write_text('province,Effective Date,Minimum Wage,Note\nAlberta,26-Jun-19,$15.00,\nAlberta,sometime,$14.00,\nOntario,01-Jan-18,$14.00,\n')
+
+    for _ in range(2):
+        # Parsed, then read back from the cache
+        wages = raw_cache.load_wages(str(path))
+        assert wages['province'].tolist() == ['Alberta', 'Ontario']
+        assert wages['Minimum Wage'].tolist() == [15.0, 14.0]
+        assert wages.index.tolist() == [0, 1]
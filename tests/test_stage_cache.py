@@ -0,0 +1,27 @@
+import stage_cache
+
+
+def test_reused_stage_prints_what_it_printed(tmp_path, monkeypatch):
+    monkeypatch.setattr(stage_cache, 'CACHE_DIR', str(tmp_path / 'stages'))
+    (tmp_path / 'stage.py').write_text("print('p-value: 0.17')\n")
+    (tmp_path / 'result.csv').write_text('a\n1\n')
+    stage = {'name': 'stage', 'path': 'stage.py', 'reads': [], 'writes': ['result.csv']}
+
+    memo = stage_cache.StageMemo([stage], str(tmp_path))
+    assert not memo.reuse(stage)
+    memo.store(stage, 'p-value: 0.17')
+
+    memo = stage_cache.StageMemo([stage], str(tmp_path))
+    assert memo.reuse(stage)
+    assert memo.stdout(stage) == 'p-value: 0.17'
+
+
+def test_record_without_stdout_runs_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(stage_cache, 'CACHE_DIR', str(tmp_path / 'stages'))
+    (tmp_path / 'stage.py').write_text("print('p-value: 0.17')\n")
+    stage = {'name': 'stage', 'path': 'stage.py', 'reads': [], 'writes': []}
+
+    memo = stage_cache.StageMemo([stage], str(tmp_path))
+    # A record from before the printed output was kept
+    stage_cache.write_json({'key': memo.key(stage), 'plots': True}, stage_cache.record_path('stage'))
+    assert not memo.reuse(stage)
@@ -0,0 +1,37 @@
+import threading
+
+import tracing
+
+
+def test_spans_stay_on_their_thread(tmp_path, monkeypatch):
+    monkeypatch.setenv(tracing.TRACE_ENV, str(tmp_path))
+    monkeypatch.setattr(tracing, 'events', [])
+    started, release = threading.Event(), threading.Event()
+    nested = []
+
+    @tracing.traced
+    def blocking():
+        started.set()
+        release.wait()
+
+    @tracing.traced
+    def inner():
+        nested.append(len(tracing.open_spans()))
+
+    @tracing.traced
+    def outer():
+        inner()
+
+    worker = threading.Thread(target=blocking)
+    worker.start()
+    started.wait()
+    # The worker's span is still open, but the main thread only sees its own
+    outer()
+    release.set()
+    worker.join()
+
+    assert nested == [2]
+    assert tracing.open_spans() == []
+    peaks = {event['name'].split('.')[-1]: event['args']['peak_rss_mb'] for event in tracing.events}
+    assert peaks['blocking'] is None
+    assert peaks['outer'] > 0 and peaks['inner'] > 0
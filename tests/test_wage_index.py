@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wage_index import WageIndex
+
+
+@pytest.mark.parametrize('provinces, dates, rates', [
+    ([], [], []),
+    # Rows without a date are dropped, which leaves nothing
+    (['Alberta'], [None], [15.0]),
+])
+def test_empty_wage_table_is_rejected(provinces, dates, rates):
+    with pytest.raises(ValueError, match='at least one wage'):
+        WageIndex(provinces, dates, rates)
+
+
+def test_single_wage():
+    index = WageIndex(['Alberta'], ['2019-06-26'], [15.0])
+    wages = index.wage_on(['Alberta', 'Alberta', 'Ontario'], ['2019-06-25', '2020-01-01', '2020-01-01'])
+    np.testing.assert_array_equal(wages, [np.nan, 15.0, np.nan])
+    rates, first_dates = index.lookup(['Alberta', 'Alberta'], [2019, 2020])
+    np.testing.assert_array_equal(rates, [15.0, np.nan])
+    assert first_dates[0] == np.datetime64(pd.Timestamp('2019-06-26'))
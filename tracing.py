@@ -0,0 +1,192 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Set (to a directory) by main.py --profile; stage processes inherit it and write their traces there
+TRACE_ENV = 'CPI_TRACE_DIR'
+TRACE_PATH = 'profile_trace.json'
+
+events = []
+# Each thread nests its own spans; the ingest threads trace loads alongside the main thread
+local = threading.local()
+
+
+def enable(trace_dir):
+    """Turn tracing on for this process and every stage it starts."""
+    os.makedirs(trace_dir, exist_ok=True)
+    os.environ[TRACE_ENV] = trace_dir
+
+
+def count_rows(value):
+    """Rows in a value: a frame, or a tuple, list or dict of frames."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(count_rows(item) for item in value)
+    return 0
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, since the last reset_peak_rss() on Linux."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    import sys
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS, and cannot be reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS mark so the next span measures only itself (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def open_spans():
+    """The spans open on the calling thread, outermost first."""
+    if not hasattr(local, 'spans'):
+        local.spans = []
+    return local.spans
+
+
+def measures_rss():
+    """
+    Whether the calling thread measures peak RSS.
+
+    The peak mark is process-wide, so a worker thread resetting it would cut short
+    the spans of every other thread. Only the main thread resets and reads it, and
+    its spans include what worker threads allocate meanwhile.
+    """
+    return threading.current_thread() is threading.main_thread()
+
+
+def fold_peak():
+    """Fold the current peak into every open span, so resetting it for a nested span loses nothing."""
+    peak = peak_rss()
+    for span in open_spans():
+        span['peak'] = max(span['peak'], peak)
+
+
+def traced(func):
+    """
+    Record wall time, CPU time, peak RSS and rows in/out of every call while tracing is on.
+
+    Peak RSS is only measured on the main thread (see measures_rss()); calls on
+    other threads record None.
+
+    Calls are stored as Chrome trace events ('X' complete events), so the merged
+    trace opens as a timeline or flame chart in chrome://tracing, Perfetto or speedscope.
+    """
+    name = f"{os.path.splitext(os.path.basename(func.__code__.co_filename))[0]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if TRACE_ENV not in os.environ:
+            return func(*args, **kwargs)
+
+        measure = measures_rss()
+        spans = open_spans()
+        if measure:
+            fold_peak()
+        span = {'peak': 0}
+        spans.append(span)
+        if measure:
+            reset_peak_rss()
+        rows_in = count_rows(list(args) + list(kwargs.values()))
+        timestamp = time.time()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        status = 'error'
+        try:
+            result = func(*args, **kwargs)
+            status = 'ok'
+        finally:
+            wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+            if measure:
+                fold_peak()
+            # By identity: spans are plain dicts and two of them can compare equal
+            del spans[next(i for i, open_span in enumerate(spans) if open_span is span)]
+            events.append({
+                'name': name,
+                'cat': 'function',
+                'ph': 'X',
+                'ts': timestamp * 1e6,
+                'dur': wall * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {
+                    'status': status,
+                    'cpu_s': cpu,
+                    'peak_rss_mb': span['peak'] / 2 ** 20 if measure else None,
+                    'rows_in': rows_in,
+                    'rows_out': count_rows(result) if status == 'ok' else 0,
+                },
+            })
+        return result
+
+    return wrapper
+
+
+def flush():
+    """Write this process's recorded events to the trace directory."""
+    trace_dir = os.environ.get(TRACE_ENV)
+    if not trace_dir or not events:
+        return
+    path = os.path.join(trace_dir, f"{os.getpid()}-{time.time_ns()}.json")
+    with open(path, 'w') as f:
+        json.dump(events, f)
+    events.clear()
+
+
+# Stage scripts run as their own processes and flush when they exit
+atexit.register(flush)
+
+
+def merge(trace_dir, output_path=TRACE_PATH):
+    """Combine the traces of every process into one Chrome trace file and return its events."""
+    flush()
+    merged = []
+    for file in sorted(os.listdir(trace_dir)):
+        if file.endswith('.json'):
+            with open(os.path.join(trace_dir, file)) as f:
+                merged.extend(json.load(f))
+    merged.sort(key=lambda event: event['ts'])
+    with open(output_path, 'w') as f:
+        json.dump({'traceEvents': merged, 'displayTimeUnit': 'ms'}, f)
+    return merged
+
+
+def print_summary(trace_events):
+    """Print one line per traced function, slowest first."""
+    totals = {}
+    for event in trace_events:
+        total = totals.setdefault(event['name'], {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': None, 'rows_in': 0, 'rows_out': 0, 'errors': 0})
+        total['calls'] += 1
+        total['wall'] += event['dur'] / 1e6
+        total['cpu'] += event['args']['cpu_s']
+        if event['args']['peak_rss_mb'] is not None:
+            total['peak'] = max(total['peak'] or 0.0, event['args']['peak_rss_mb'])
+        total['rows_in'] += event['args']['rows_in']
+        total['rows_out'] += event['args']['rows_out']
+        total['errors'] += event['args']['status'] != 'ok'
+
+    print(f"\n{'function':<60}{'calls':>6}{'wall (s)':>10}{'cpu (s)':>10}{'peak RSS (MB)':>15}{'rows in':>10}{'rows out':>10}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['wall']):
+        errors = f"  ({total['errors']} failed)" if total['errors'] else ''
+        # Functions only ever called on worker threads have no peak
+        peak = '-' if total['peak'] is None else f"{total['peak']:.1f}"
+        print(f"{name:<60}{total['calls']:>6}{total['wall']:>10.3f}{total['cpu']:>10.3f}{peak:>15}{total['rows_in']:>10}{total['rows_out']:>10}{errors}")
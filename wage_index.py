@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+import raw_cache
+
+# Province codes are packed above the day number so one sorted array covers every province
+PROVINCE_STRIDE = np.int64(1) << 32
+
+
+class WageIndex:
+    """
+    Minimum wage timeline for every province.
+
+    Each province keeps its effective dates in sorted order, so the wage in
+    force on any date is found with a binary search. All provinces share one
+    sorted key array (province code, then day), which lets a whole array of
+    (province, date) queries be answered with a single np.searchsorted call.
+    Rates announced for the same province and date (e.g. regional or
+    gender-specific rates) are averaged. Rows missing any of the three are
+    dropped, and a table left with none raises ValueError.
+    """
+
+    def __init__(self, provinces, effective_dates, rates):
+        entries = pd.DataFrame({
+            'province': np.asarray(provinces),
+            'date': pd.to_datetime(effective_dates),
+            'rate': np.asarray(rates, dtype=np.float64),
+        }).dropna()
+        if entries.empty:
+            raise ValueError("WageIndex needs at least one wage with a province, an effective date and a rate")
+
+        # Rates that took effect in each province-year: their mean and the first date one did
+        announced = entries.sort_values(['province', 'date'], kind='stable')
+        announced = announced.groupby(['province', announced['date'].dt.year.rename('year')], sort=True).agg(
+            first_date=('date', 'first'), rate=('rate', 'mean')).reset_index()
+
+        entries = entries.groupby(['province', 'date'], sort=True)['rate'].mean().reset_index()
+
+        self.provinces = pd.Index(entries['province'].unique(), name='province')
+        self.codes = self.provinces.get_indexer(entries['province'])
+        self.dates = pd.DatetimeIndex(entries['date'])
+        self.rates = entries['rate'].to_numpy()
+
+        days = self.dates.values.astype('datetime64[D]').astype(np.int64)
+        self.base_day = days.min() - 1
+        self.keys = self.codes.astype(np.int64) * PROVINCE_STRIDE + (days - self.base_day)
+
+        self.year_keys = self.provinces.get_indexer(announced['province']).astype(np.int64) * PROVINCE_STRIDE + announced['year'].to_numpy()
+        self.year_first_dates = announced['first_date'].to_numpy()
+        self.year_rates = announced['rate'].to_numpy()
+        self.cache = {}
+
+    @classmethod
+    def from_frame(cls, wage_df):
+        """Build the index from a parsed wage table (province, Effective Date, Minimum Wage)."""
+        return cls(wage_df['province'], wage_df['Effective Date'], wage_df['Minimum Wage'])
+
+    @classmethod
+    def load(cls, wage_path):
+        """Load wages.csv through the raw table cache and build the index."""
+        return cls.from_frame(raw_cache.load_wages(wage_path))
+
+    def wage_on(self, provinces, dates):
+        """
+        Minimum wage in force on each date.
+
+        Parameters:
+        - provinces: a province name, or an array of names matching dates.
+        - dates: a date or an array of dates.
+
+        Returns:
+        - np.ndarray: the wage per query, NaN for unknown provinces and dates before a province's first rate.
+        """
+        dates = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(dates)))
+        provinces = np.broadcast_to(np.asarray(provinces, dtype=object), dates.shape)
+        codes = self.provinces.get_indexer(provinces)
+
+        # Days before the first rate map to 0, which sorts ahead of every entry of the province
+        days = np.maximum(dates.values.astype('datetime64[D]').astype(np.int64) - self.base_day, 0)
+        positions = np.searchsorted(self.keys, codes.astype(np.int64) * PROVINCE_STRIDE + days, side='right') - 1
+
+        found = (codes >= 0) & (positions >= 0)
+        found[found] = self.codes[positions[found]] == codes[found]
+        wages = np.full(len(dates), np.nan)
+        wages[found] = self.rates[positions[found]]
+        return wages
+
+    def lookup(self, provinces, years):
+        """
+        Rates announced in each (province, year), as a province-year merge of the wage table gives them.
+
+        Only the distinct provinces are matched by name; every row is then a
+        single searchsorted on the sorted (province, year) keys.
+
+        Parameters:
+        - provinces: an array of province names.
+        - years: an array of calendar years matching provinces.
+
+        Returns:
+        - np.ndarray: the mean rate announced that year, NaN when the province announced none.
+        - np.ndarray: the first effective date that year, NaT when there was none.
+        """
+        codes, uniques = pd.factorize(np.asarray(provinces, dtype=object))
+        codes = np.append(self.provinces.get_indexer(uniques), -1)[codes]
+        keys = codes.astype(np.int64) * PROVINCE_STRIDE + np.asarray(years, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(self.year_keys, keys), len(self.year_keys) - 1)
+        found = (codes >= 0) & (self.year_keys[positions] == keys)
+        rates = np.full(len(keys), np.nan)
+        rates[found] = self.year_rates[positions[found]]
+        first_dates = np.full(len(keys), np.datetime64('NaT'), dtype=self.year_first_dates.dtype)
+        first_dates[found] = self.year_first_dates[positions[found]]
+        return rates, first_dates
+
+    def monthly(self, start, end):
+        """Wage in force on the first of every month from start to end (months x provinces), cached."""
+        key = ('monthly', str(start), str(end))
+        if key not in self.cache:
+            months = pd.date_range(start, end, freq='MS', name='date')
+            grid_provinces = np.repeat(self.provinces.to_numpy(), len(months))
+            grid_months = np.tile(months.values, len(self.provinces))
+            wages = self.wage_on(grid_provinces, grid_months).reshape(len(self.provinces), len(months))
+            self.cache[key] = pd.DataFrame(wages.T, index=months, columns=self.provinces)
+        return self.cache[key]
+
+    def annual_mean(self, start_year, end_year):
+        """Mean of the monthly wage in force for every calendar year (years x provinces), cached."""
+        key = ('annual', start_year, end_year)
+        if key not in self.cache:
+            monthly = self.monthly(f"{start_year}-01-01", f"{end_year}-12-01")
+            self.cache[key] = monthly.groupby(monthly.index.year.rename('year')).mean()
+        return self.cache[key]